@@ -1,16 +1,53 @@
 from django.contrib import admin
+from django.db.models.functions import Substr
 from .models import Post, Comment, Like, KarmaEvent
 
 
+PREVIEW_LENGTH = 50
+
+
+def is_changelist(request):
+    match = request.resolver_match
+    return match is not None and match.url_name.endswith('_changelist')
+
+
+def narrow_for_changelist(queryset, *fields):
+    """
+    Load only the columns the changelist renders, plus a content preview.
+    
+    The preview is sliced in the database so the full TEXT column stays
+    unloaded; one extra character is fetched so format_preview() can tell
+    whether the content was truncated.
+    """
+    return queryset.annotate(
+        preview=Substr('content', 1, PREVIEW_LENGTH + 1)
+    ).only(*fields)
+
+
+def format_preview(obj):
+    preview = obj.preview
+    return preview[:PREVIEW_LENGTH] + "..." if len(preview) > PREVIEW_LENGTH else preview
+
+
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ['id', 'author', 'content_preview', 'like_count', 'comment_count', 'created_at']
+    list_display = ['id', 'author_username', 'content_preview', 'like_count', 'comment_count', 'created_at']
     list_filter = ['created_at', 'author']
     search_fields = ['content', 'author__username']
     readonly_fields = ['like_count', 'comment_count', 'created_at', 'updated_at']
     
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if is_changelist(request):
+            # The author is listed from the denormalized username - no join
+            queryset = narrow_for_changelist(
+                queryset.select_related(None),
+                'id', 'author_username', 'like_count', 'comment_count', 'created_at'
+            )
+        return queryset
+    
     def content_preview(self, obj):
-        return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
+        return format_preview(obj)
     content_preview.short_description = 'Content'
 
 
@@ -21,8 +58,22 @@ class CommentAdmin(admin.ModelAdmin):
     search_fields = ['content', 'author__username']
     readonly_fields = ['like_count', 'created_at', 'updated_at']
     
+    def get_queryset(self, request):
+        # author, post and parent are all rendered per row (and str() of
+        # parent reads its author), so join everything up front
+        queryset = super().get_queryset(request).select_related(
+            'author', 'post', 'parent', 'parent__author', 'parent__post'
+        )
+        if is_changelist(request):
+            queryset = narrow_for_changelist(
+                queryset, 'id', 'like_count', 'created_at', 'author__username',
+                'post__content', 'post__author_username',
+                'parent__author__username', 'parent__post__id'
+            )
+        return queryset
+    
     def content_preview(self, obj):
-        return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
+        return format_preview(obj)
     content_preview.short_description = 'Content'
 
 
@@ -32,6 +83,9 @@ class LikeAdmin(admin.ModelAdmin):
     list_filter = ['content_type', 'created_at']
     search_fields = ['user__username']
     readonly_fields = ['created_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
 
 
 @admin.register(KarmaEvent)
@@ -39,4 +93,7 @@ class KarmaEventAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'event_type', 'source_id', 'points', 'created_at']
     list_filter = ['event_type', 'created_at']
     search_fields = ['user__username']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
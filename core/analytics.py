@@ -27,10 +27,87 @@ Analytics Features to Add:
    - Exportable reports
 """
 
+from django.apps import apps
 from django.db import models
+from django.db.models import F, Func, IntegerField, OuterRef, Subquery
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, time, timedelta
+import hashlib
+import math
+
+
+def _count(queryset):
+    """Scalar ``COUNT(*)`` subquery over ``queryset`` (no GROUP BY needed)"""
+    return Subquery(
+        queryset.order_by().annotate(n=Func(F('pk'), function='COUNT')).values('n'),
+        output_field=IntegerField(),
+    )
+
+
+def _day_range(date):
+    """
+    Aware [start, end) datetimes covering ``date``.
+    
+    Filtering on these bounds keeps the predicate on the bare column so the
+    created_at indexes can be used; ``__date`` wraps the column in a cast
+    and forces a scan.
+    """
+    start = timezone.make_aware(datetime.combine(date, time.min))
+    return start, start + timedelta(days=1)
+
+
+class HyperLogLog:
+    """
+    Minimal HyperLogLog sketch for approximate distinct counts.
+    
+    Registers are stored one per byte so the sketch round-trips through a
+    BinaryField as-is. With precision 12 that is 4 KiB per sketch and a
+    standard error of ~1.6%, regardless of how many items are added.
+    Sketches merge by taking the register-wise max, so the distinct count
+    over several days is just the count of the merged sketch.
+    """
+    PRECISION = 12
+    NUM_REGISTERS = 1 << PRECISION
+    
+    def __init__(self, data=None):
+        if data:
+            self.registers = bytearray(data)
+        else:
+            self.registers = bytearray(self.NUM_REGISTERS)
+    
+    def __bytes__(self):
+        return bytes(self.registers)
+    
+    def add(self, value):
+        """Add a value; returns True if the sketch changed"""
+        x = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+        index = x >> (64 - self.PRECISION)
+        rest = x & ((1 << (64 - self.PRECISION)) - 1)
+        rank = (64 - self.PRECISION) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+    
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+    
+    def count(self):
+        """Estimated number of distinct values added"""
+        m = self.NUM_REGISTERS
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
 
 class UserAnalytics(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -38,7 +115,6 @@ class UserAnalytics(models.Model):
     total_comments = models.PositiveIntegerField(default=0)
     total_likes_received = models.PositiveIntegerField(default=0)
     total_likes_given = models.PositiveIntegerField(default=0)
-    avg_engagement_rate = models.FloatField(default=0.0)
     last_updated = models.DateTimeField(auto_now=True)
     
     def calculate_engagement_rate(self):
@@ -47,28 +123,65 @@ class UserAnalytics(models.Model):
             return 0.0
         return (self.total_likes_received + self.total_comments) / self.total_posts
     
+    @property
+    def avg_engagement_rate(self):
+        """Derived from the counters, so it is never stale and costs no write"""
+        return self.calculate_engagement_rate()
+    
+    @classmethod
+    def increment(cls, user_id, field, delta=1):
+        """Atomically adjust one counter, never going below zero"""
+        queryset = cls.objects.filter(user_id=user_id)
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+        queryset.update(**{field: F(field) + delta})
+    
     def update_analytics(self):
-        """Update user analytics from actual data"""
-        from .models import Post, Comment, Like
-        
-        self.total_posts = Post.objects.filter(author=self.user).count()
-        self.total_comments = Comment.objects.filter(author=self.user).count()
+        """
+        Update user analytics from actual data.
         
-        # Count likes received on user's posts and comments
-        post_likes = Like.objects.filter(
-            content_type='post',
-            object_id__in=Post.objects.filter(author=self.user).values_list('id', flat=True)
-        ).count()
+        The counters are kept current by signals (see below), so this is a
+        full reconciliation. All five counters are computed as scalar
+        subqueries of a single SELECT, so it costs one round-trip.
+        """
+        from .models import Post, Comment, Like
         
-        comment_likes = Like.objects.filter(
-            content_type='comment',
-            object_id__in=Comment.objects.filter(author=self.user).values_list('id', flat=True)
-        ).count()
+        counts = User.objects.filter(pk=self.user_id).annotate(
+            n_posts=_count(Post.objects.filter(author=OuterRef('pk'))),
+            n_comments=_count(Comment.objects.filter(author=OuterRef('pk'))),
+            # Likes received on user's posts and comments, joined through
+            # the like's target foreign key rather than an IN (SELECT id ...)
+            n_post_likes=_count(Like.objects.filter(post__author=OuterRef('pk'))),
+            n_comment_likes=_count(Like.objects.filter(comment__author=OuterRef('pk'))),
+            n_likes_given=_count(Like.objects.filter(user=OuterRef('pk'))),
+        ).values(
+            'n_posts', 'n_comments', 'n_post_likes', 'n_comment_likes', 'n_likes_given'
+        ).get()
         
-        self.total_likes_received = post_likes + comment_likes
-        self.total_likes_given = Like.objects.filter(user=self.user).count()
-        self.avg_engagement_rate = self.calculate_engagement_rate()
-        self.save()
+        self.total_posts = counts['n_posts']
+        self.total_comments = counts['n_comments']
+        self.total_likes_received = counts['n_post_likes'] + counts['n_comment_likes']
+        self.total_likes_given = counts['n_likes_given']
+        self.save(update_fields=[
+            'total_posts', 'total_comments', 'total_likes_received',
+            'total_likes_given', 'last_updated',
+        ])
+
+# Live per-day counters kept in the cache (Redis in production), keyed
+# ``stats:<date>:<counter>``. Each maps a DailyStats field to the model rows
+# it counts.
+DAILY_COUNTERS = {
+    'new_users': ('auth.User', 'date_joined'),
+    'new_posts': ('core.Post', 'created_at'),
+    'new_comments': ('core.Comment', 'created_at'),
+    'total_likes': ('core.Like', 'created_at'),
+}
+DAILY_COUNTER_TIMEOUT = 60 * 60 * 48
+
+
+def _daily_counter_key(date, counter):
+    return f'stats:{date.isoformat()}:{counter}'
+
 
 class DailyStats(models.Model):
     date = models.DateField(unique=True)
@@ -77,39 +190,172 @@ class DailyStats(models.Model):
     new_comments = models.PositiveIntegerField(default=0)
     total_likes = models.PositiveIntegerField(default=0)
     active_users = models.PositiveIntegerField(default=0)
+    # HyperLogLog sketch of the day's active user IDs, so several days can
+    # be merged into one distinct count
+    active_users_sketch = models.BinaryField(default=bytes)
+    # Set once the row has been generated after its day ended; the day's
+    # figures can't change after that, so it is never recomputed
+    is_final = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['-date']
     
     @classmethod
-    def generate_daily_stats(cls, date=None):
-        """Generate stats for a specific date"""
+    def active_users_between(cls, start, end):
+        """Approximate distinct active users over a date range (inclusive)"""
+        merged = HyperLogLog()
+        for data in cls.objects.filter(date__range=(start, end)).values_list('active_users_sketch', flat=True):
+            if data:
+                merged.merge(HyperLogLog(data))
+        return merged.count()
+    
+    @classmethod
+    def bump_counter(cls, counter, date=None):
+        """Count one new row towards a live daily counter"""
         if date is None:
             date = timezone.now().date()
         
-        from .models import Post, Comment, Like
+        key = _daily_counter_key(date, counter)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Missing (first event since the key expired or the cache was
+            # flushed): seed from the database, which already includes this row
+            model_label, date_field = DAILY_COUNTERS[counter]
+            start, end = _day_range(date)
+            total = apps.get_model(model_label).objects.filter(**{
+                f'{date_field}__gte': start, f'{date_field}__lt': end,
+            }).count()
+            cache.add(key, total, DAILY_COUNTER_TIMEOUT)
+    
+    @classmethod
+    def live_counts(cls, date=None):
+        """
+        Counters for ``date`` straight from the cache, for live dashboards.
         
-        stats, created = cls.objects.get_or_create(date=date)
+        Returns None unless every counter is present.
+        """
+        if date is None:
+            date = timezone.now().date()
         
-        # Count new registrations
-        stats.new_users = User.objects.filter(date_joined__date=date).count()
+        keys = {_daily_counter_key(date, counter): counter for counter in DAILY_COUNTERS}
+        cached = cache.get_many(keys)
+        if len(cached) < len(keys):
+            return None
+        return {keys[key]: value for key, value in cached.items()}
+    
+    @classmethod
+    def generate_daily_stats(cls, date=None):
+        """Generate stats for a specific date"""
+        today = timezone.now().date()
+        if date is None:
+            date = today
         
-        # Count new posts
-        stats.new_posts = Post.objects.filter(created_at__date=date).count()
+        from .models import Post, Comment, Like
         
-        # Count new comments
-        stats.new_comments = Comment.objects.filter(created_at__date=date).count()
+        stats, created = cls.objects.get_or_create(date=date)
+        # A row generated while its day was still running is out of date,
+        # so only one finalized after the day closed is safe to return as is
+        if stats.is_final:
+            return stats
+        start, end = _day_range(date)
+        on_day = {'created_at__gte': start, 'created_at__lt': end}
         
-        # Count total likes
-        stats.total_likes = Like.objects.filter(created_at__date=date).count()
+        # New registrations, posts, comments and likes: from the live cache
+        # counters when available, otherwise as scalar subqueries of a
+        # single SELECT on the stats row
+        counts = cls.live_counts(date)
+        if counts is None:
+            counts = cls.objects.filter(pk=stats.pk).values(
+                new_users_count=_count(User.objects.filter(date_joined__gte=start, date_joined__lt=end)),
+                new_posts_count=_count(Post.objects.filter(**on_day)),
+                new_comments_count=_count(Comment.objects.filter(**on_day)),
+                total_likes_count=_count(Like.objects.filter(**on_day)),
+            ).get()
+            counts = {counter: counts[f'{counter}_count'] for counter in DAILY_COUNTERS}
         
-        # Count active users (posted, commented, or liked)
-        active_user_ids = set()
-        active_user_ids.update(Post.objects.filter(created_at__date=date).values_list('author_id', flat=True))
-        active_user_ids.update(Comment.objects.filter(created_at__date=date).values_list('author_id', flat=True))
-        active_user_ids.update(Like.objects.filter(created_at__date=date).values_list('user_id', flat=True))
+        for counter, value in counts.items():
+            setattr(stats, counter, value)
         
-        stats.active_users = len(active_user_ids)
+        # Count active users (posted, commented, or liked). UNION deduplicates
+        # in the database; the distinct IDs are folded into the day's sketch
+        # here rather than on every write, so activity never locks this row.
+        active_user_ids = (
+            Post.objects.filter(**on_day).order_by().values_list('author_id')
+            .union(
+                Comment.objects.filter(**on_day).order_by().values_list('author_id'),
+                Like.objects.filter(**on_day).order_by().values_list('user_id'),
+            )
+        )
+        sketch = HyperLogLog()
+        stats.active_users = 0
+        for (user_id,) in active_user_ids.iterator():
+            sketch.add(user_id)
+            stats.active_users += 1
+        stats.active_users_sketch = bytes(sketch)
+        stats.is_final = date < today
         stats.save()
         
-        return stats
\ No newline at end of file
+        return stats
+
+
+# Incremental UserAnalytics counters: O(1) UPDATE per write instead of a
+# recount. Users without an analytics row are simply skipped.
+
+@receiver(post_save, sender='core.Post')
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        UserAnalytics.increment(instance.author_id, 'total_posts')
+
+
+@receiver(post_delete, sender='core.Post')
+def uncount_post(sender, instance, **kwargs):
+    UserAnalytics.increment(instance.author_id, 'total_posts', -1)
+
+
+@receiver(post_save, sender='core.Comment')
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        UserAnalytics.increment(instance.author_id, 'total_comments')
+
+
+@receiver(post_delete, sender='core.Comment')
+def uncount_comment(sender, instance, **kwargs):
+    UserAnalytics.increment(instance.author_id, 'total_comments', -1)
+
+
+def _liked_author_id(like):
+    """Author of the post/comment a like points at"""
+    from .models import Post, Comment
+    
+    model = Post if like.content_type == 'post' else Comment
+    return model.objects.filter(id=like.object_id).values_list('author_id', flat=True).first()
+
+
+@receiver(post_save, sender='core.Like')
+def count_like(sender, instance, created, **kwargs):
+    if created:
+        UserAnalytics.increment(instance.user_id, 'total_likes_given')
+        UserAnalytics.increment(_liked_author_id(instance), 'total_likes_received')
+
+
+@receiver(post_delete, sender='core.Like')
+def uncount_like(sender, instance, **kwargs):
+    UserAnalytics.increment(instance.user_id, 'total_likes_given', -1)
+    UserAnalytics.increment(_liked_author_id(instance), 'total_likes_received', -1)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender='core.Post')
+@receiver(post_save, sender='core.Comment')
+@receiver(post_save, sender='core.Like')
+def bump_daily_counter(sender, instance, created, **kwargs):
+    """Keep the live DailyStats counters in the cache current"""
+    if created:
+        counter = {
+            'user': 'new_users',
+            'post': 'new_posts',
+            'comment': 'new_comments',
+            'like': 'total_likes',
+        }[sender._meta.model_name]
+        DailyStats.bump_counter(counter)
@@ -28,9 +28,16 @@ Gamification Features to Add:
    - Rising stars (new users with high engagement)
 """
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.utils import timezone
+from bisect import bisect_right
+import time
 
 class Achievement(models.Model):
     ACHIEVEMENT_TYPES = [
@@ -113,47 +120,47 @@ class UserStreak(models.Model):
     
     def update_login_streak(self):
         """Update login streak when user logs in"""
-        today = timezone.now().date()
-        
-        if self.last_login_date is None:
-            # First login
-            self.current_login_streak = 1
-            self.longest_login_streak = 1
-        elif self.last_login_date == today:
-            # Already logged in today, no change
-            return
-        elif self.last_login_date == today - timezone.timedelta(days=1):
-            # Consecutive day login
-            self.current_login_streak += 1
-            self.longest_login_streak = max(self.longest_login_streak, self.current_login_streak)
-        else:
-            # Streak broken
-            self.current_login_streak = 1
-        
-        self.last_login_date = today
-        self.save()
+        self._advance_streak('current_login_streak', 'longest_login_streak', 'last_login_date')
     
     def update_post_streak(self):
         """Update post streak when user creates a post"""
+        self._advance_streak('current_post_streak', 'longest_post_streak', 'last_post_date')
+    
+    def _advance_streak(self, current_field, longest_field, last_date_field):
+        """
+        Advance a daily streak with a single UPDATE.
+        
+        The new values are computed in the database from the row's current
+        state, so there is no SELECT before the write and concurrent events
+        for the same user can't overwrite each other.
+        """
         today = timezone.now().date()
+        yesterday = today - timezone.timedelta(days=1)
         
-        if self.last_post_date is None:
-            # First post
-            self.current_post_streak = 1
-            self.longest_post_streak = 1
-        elif self.last_post_date == today:
-            # Already posted today, no change
+        if getattr(self, last_date_field) == today:
+            # Already counted today, no change
             return
-        elif self.last_post_date == today - timezone.timedelta(days=1):
-            # Consecutive day post
-            self.current_post_streak += 1
-            self.longest_post_streak = max(self.longest_post_streak, self.current_post_streak)
-        else:
-            # Streak broken
-            self.current_post_streak = 1
         
-        self.last_post_date = today
-        self.save()
+        # Consecutive day extends the streak; first event or a gap restarts it
+        new_current = Case(
+            When(**{last_date_field: yesterday, 'then': F(current_field) + 1}),
+            default=Value(1),
+            output_field=models.PositiveIntegerField(),
+        )
+        UserStreak.objects.filter(pk=self.pk).exclude(**{last_date_field: today}).update(**{
+            current_field: new_current,
+            longest_field: Greatest(F(longest_field), new_current),
+            last_date_field: today,
+        })
+        
+        # Mirror the write on this instance
+        if getattr(self, last_date_field) == yesterday:
+            current = getattr(self, current_field) + 1
+        else:
+            current = 1
+        setattr(self, current_field, current)
+        setattr(self, longest_field, max(getattr(self, longest_field), current))
+        setattr(self, last_date_field, today)
 
 class Challenge(models.Model):
     CHALLENGE_TYPES = [
@@ -187,12 +194,30 @@ class UserChallenge(models.Model):
         unique_together = ['user', 'challenge']
     
     def update_progress(self, increment=1):
-        """Update challenge progress"""
-        self.current_progress += increment
+        """
+        Update challenge progress.
+        
+        Progress and completion are written in one UPDATE computed from the
+        row's current values, so concurrent events can't lose increments
+        and the challenge completes exactly once. ``target_value`` is read
+        from ``self.challenge`` (select_related it when loading in bulk).
+        """
+        target = self.challenge.target_value
+        now = timezone.now()
+        # Evaluated against the pre-update progress
+        reaches_target = Q(is_completed=False, current_progress__gte=target - increment)
         
-        if self.current_progress >= self.challenge.target_value and not self.is_completed:
+        UserChallenge.objects.filter(pk=self.pk).update(
+            current_progress=F('current_progress') + increment,
+            is_completed=Case(When(reaches_target, then=Value(True)), default=F('is_completed')),
+            completed_at=Case(When(reaches_target, then=Value(now)), default=F('completed_at')),
+        )
+        
+        # Mirror the write on this instance
+        self.current_progress += increment
+        if self.current_progress >= target and not self.is_completed:
             self.is_completed = True
-            self.completed_at = timezone.now()
+            self.completed_at = now
             
             # Award points to user (implement karma system integration)
             # KarmaEvent.objects.create(
@@ -201,8 +226,6 @@ class UserChallenge(models.Model):
             #     source_id=self.challenge.id,
             #     points=self.challenge.reward_points
             # )
-        
-        self.save()
     
     @property
     def progress_percentage(self):
@@ -212,36 +235,125 @@ class UserChallenge(models.Model):
         return min(100, (self.current_progress / self.challenge.target_value) * 100)
 
 # Achievement checking functions
-def check_and_award_achievements(user, event_type, **kwargs):
-    """Check if user has earned any new achievements"""
+KARMA_MILESTONES = ((100, 'karma_100'), (500, 'karma_500'), (1000, 'karma_1000'), (5000, 'karma_5000'))
+_KARMA_THRESHOLDS = [threshold for threshold, _ in KARMA_MILESTONES]
+
+# Field values used when an achievement row is first created
+_ACHIEVEMENT_DEFAULTS = {
+    'first_post': {
+        'title': 'First Post!',
+        'description': 'Created your first post in the community',
+        'icon': '📝',
+        'points': 10,
+    },
+    **{
+        achievement_name: {
+            'title': f'{threshold} Karma Points!',
+            'description': f'Reached {threshold} karma points',
+            'icon': '⭐',
+            'points': threshold // 10,
+        }
+        for threshold, achievement_name in KARMA_MILESTONES
+    },
+}
+
+
+# Achievement ids by name, cached per process. Only ids are kept - never
+# model instances whose fields could go stale - and they are tagged with a
+# version in the shared cache, which deleting an Achievement bumps in every
+# process's view (like ContentFilter's pipeline version).
+ACHIEVEMENT_IDS_VERSION_KEY = 'gamification:achievement_ids:version'
+_achievement_ids = {}
+_achievement_ids_version = None
+
+
+def _get_achievement_ids(names):
+    """Ids of the named achievements, each row created on first use"""
+    global _achievement_ids_version
+    
+    # A missing key is re-seeded with a fresh value, which no process holds
+    version = cache.get_or_set(ACHIEVEMENT_IDS_VERSION_KEY, time.time_ns, None)
+    if version != _achievement_ids_version:
+        _achievement_ids.clear()
+        _achievement_ids_version = version
+    
+    for name in names:
+        if name not in _achievement_ids:
+            achievement, created = Achievement.objects.get_or_create(
+                name=name, defaults=_ACHIEVEMENT_DEFAULTS[name]
+            )
+            _achievement_ids[name] = achievement.id
+    return [_achievement_ids[name] for name in names]
+
+
+def _bump_achievement_ids_version():
+    try:
+        cache.incr(ACHIEVEMENT_IDS_VERSION_KEY)
+    except ValueError:
+        # Nothing cached against a missing version
+        pass
+
+
+@receiver(post_delete, sender=Achievement)
+def forget_achievement_ids(sender, **kwargs):
+    """A recreated achievement gets a new id - drop the cached ones everywhere"""
+    transaction.on_commit(_bump_achievement_ids_version)
+
+
+def _award(user, achievement_ids):
+    """
+    Award achievements in a single INSERT.
+    
+    Ones the user already holds are skipped by the (user, achievement)
+    unique constraint rather than checked for first.
+    """
+    UserAchievement.objects.bulk_create(
+        [UserAchievement(user=user, achievement_id=achievement_id) for achievement_id in achievement_ids],
+        ignore_conflicts=True
+    )
+
+
+def awarded_achievement_names(user):
+    """Names of the achievements a user already holds - load once, e.g. at login"""
+    return set(
+        UserAchievement.objects.filter(user=user).values_list('achievement__name', flat=True)
+    )
+
+
+def check_and_award_achievements(user, event_type, awarded=None, **kwargs):
+    """
+    Check if user has earned any new achievements.
+    
+    ``awarded`` is an optional set from awarded_achievement_names(). When
+    given, achievements already in it are skipped without any SQL, and
+    newly awarded names are added to it.
+    """
+    from .models import Post
+    
+    if awarded is None:
+        awarded = set()
     
     if event_type == 'first_post':
-        achievement, created = Achievement.objects.get_or_create(
-            name='first_post',
-            defaults={
-                'title': 'First Post!',
-                'description': 'Created your first post in the community',
-                'icon': '📝',
-                'points': 10
-            }
-        )
-        UserAchievement.objects.get_or_create(user=user, achievement=achievement)
+        if 'first_post' in awarded:
+            return
+        # EXISTS stops at the first matching row
+        if not Post.objects.filter(author=user).exists():
+            return
+        _award(user, _get_achievement_ids(['first_post']))
+        awarded.add('first_post')
     
     elif event_type == 'karma_milestone':
         karma = kwargs.get('karma', 0)
-        milestones = [(100, 'karma_100'), (500, 'karma_500'), (1000, 'karma_1000'), (5000, 'karma_5000')]
+        # Milestones are sorted, so everything left of the bisection point is reached
+        reached = [
+            achievement_name
+            for _, achievement_name in KARMA_MILESTONES[:bisect_right(_KARMA_THRESHOLDS, karma)]
+            if achievement_name not in awarded
+        ]
+        if not reached:
+            return
         
-        for threshold, achievement_name in milestones:
-            if karma >= threshold:
-                achievement, created = Achievement.objects.get_or_create(
-                    name=achievement_name,
-                    defaults={
-                        'title': f'{threshold} Karma Points!',
-                        'description': f'Reached {threshold} karma points',
-                        'icon': '⭐',
-                        'points': threshold // 10
-                    }
-                )
-                UserAchievement.objects.get_or_create(user=user, achievement=achievement)
-    
-    # Add more achievement checks as needed...
\ No newline at end of file
+        _award(user, _get_achievement_ids(reached))
+        awarded.update(reached)
+    
+    # Add more achievement checks as needed...
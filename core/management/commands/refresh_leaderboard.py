@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.models import LeaderboardSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the 24h leaderboard snapshot (run from cron, e.g. every minute)'
+
+    def handle(self, *args, **options):
+        count = LeaderboardSnapshot.refresh()
+        self.stdout.write(self.style.SUCCESS(f'Leaderboard snapshot refreshed: {count} users'))
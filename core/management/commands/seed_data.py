@@ -1,12 +1,46 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from core.models import Post, Comment, Like
+from django.db import connection, transaction
+from core.models import Post, Comment, Like, KarmaEvent
+import csv
+import io
 import random
 
 
+def copy_insert(model, objs):
+    """
+    Insert rows whose primary keys aren't needed afterwards.
+    
+    On PostgreSQL the rows are streamed with COPY ... FROM STDIN, which
+    skips per-row parameter binding and the parameter limit of a multi-row
+    INSERT. Other backends fall back to bulk_create().
+    """
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_create(objs)
+        return
+    
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for obj in objs:
+        # pre_save() fills in auto_now_add timestamps like save() would
+        writer.writerow([field.pre_save(obj, add=True) for field in fields])
+    buffer.seek(0)
+    
+    columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN WITH CSV',
+            buffer
+        )
+
+
 class Command(BaseCommand):
     help = 'Seed database with test data'
 
+    # One transaction for the whole run: a single commit/fsync instead of
+    # one per statement, and a failed seed leaves nothing half-written
+    @transaction.atomic
     def handle(self, *args, **options):
         self.stdout.write('Creating test users...')
         
@@ -30,7 +64,6 @@ class Command(BaseCommand):
         self.stdout.write('Creating test posts...')
         
         # Create test posts
-        posts = []
         post_contents = [
             "Just discovered this amazing new Python library! Anyone else tried it?",
             "Working on a Django project and loving the ORM optimizations.",
@@ -44,12 +77,12 @@ class Command(BaseCommand):
             "Code review best practices for teams?"
         ]
         
-        for i, content in enumerate(post_contents):
-            post = Post.objects.create(
-                author=users[i % len(users)],
-                content=content
-            )
-            posts.append(post)
+        # bulk_create() bypasses save(), which normally copies author_username
+        authors = [users[i % len(users)] for i in range(len(post_contents))]
+        posts = Post.objects.bulk_create([
+            Post(author=author, author_username=author.username, content=content)
+            for author, content in zip(authors, post_contents)
+        ])
         
         self.stdout.write('Creating test comments...')
         
@@ -67,63 +100,93 @@ class Command(BaseCommand):
             "Brilliant solution, thanks!"
         ]
         
-        comments = []
-        for post in posts:
-            # Create 2-5 root comments per post
-            num_comments = random.randint(2, 5)
-            for i in range(num_comments):
-                comment = Comment.objects.create(
-                    post=post,
-                    author=random.choice(users),
-                    content=random.choice(comment_contents)
+        def build_comments(targets):
+            """Comments for (post, parent) pairs, drawing all authors/contents in one go"""
+            n = len(targets)
+            return [
+                Comment(
+                    post=post, parent=parent, author=author, content=content,
+                    # bulk_create() bypasses save(), which normally sets depth
+                    depth=parent.depth + 1 if parent else 0
                 )
-                comments.append(comment)
-                
-                # 30% chance to create a reply
-                if random.random() < 0.3:
-                    reply = Comment.objects.create(
-                        post=post,
-                        parent=comment,
-                        author=random.choice(users),
-                        content=random.choice(comment_contents)
-                    )
-                    comments.append(reply)
-                    
-                    # 20% chance to create a reply to the reply
-                    if random.random() < 0.2:
-                        nested_reply = Comment.objects.create(
-                            post=post,
-                            parent=reply,
-                            author=random.choice(users),
-                            content=random.choice(comment_contents)
-                        )
-                        comments.append(nested_reply)
+                for (post, parent), author, content in zip(
+                    targets,
+                    random.choices(users, k=n),
+                    random.choices(comment_contents, k=n)
+                )
+            ]
+        
+        # One bulk insert per tree level: replies need their parent's id,
+        # so roots go first, then replies, then replies to replies.
+        # Create 2-5 root comments per post
+        root_comments = Comment.objects.bulk_create(build_comments([
+            (post, None)
+            for post in posts
+            for _ in range(random.randint(2, 5))
+        ]))
+        
+        # 30% chance to create a reply
+        replies = Comment.objects.bulk_create(build_comments([
+            (comment.post, comment)
+            for comment in root_comments
+            if random.random() < 0.3
+        ]))
+        
+        # 20% chance to create a reply to the reply
+        nested_replies = Comment.objects.bulk_create(build_comments([
+            (reply.post, reply)
+            for reply in replies
+            if random.random() < 0.2
+        ]))
+        
+        comments = root_comments + replies + nested_replies
         
         self.stdout.write('Creating test likes...')
         
-        # Create random likes for posts and comments
+        # Create random likes for posts and comments. Sampling from a range
+        # picks indices without copying the user list for every post/comment.
+        user_indices = range(len(users))
+        likes = []
         for post in posts:
             # Each post gets 1-8 likes
             num_likes = random.randint(1, 8)
-            liked_users = random.sample(users, min(num_likes, len(users)))
-            for user in liked_users:
-                Like.objects.get_or_create(
-                    user=user,
-                    content_type='post',
-                    object_id=post.id
-                )
+            for i in random.sample(user_indices, min(num_likes, len(users))):
+                likes.append(Like(user=users[i], content_type='post', object_id=post.id, post=post))
         
         for comment in comments:
             # Each comment gets 0-5 likes
             num_likes = random.randint(0, 5)
-            if num_likes > 0:
-                liked_users = random.sample(users, min(num_likes, len(users)))
-                for user in liked_users:
-                    Like.objects.get_or_create(
-                        user=user,
-                        content_type='comment',
-                        object_id=comment.id
-                    )
+            for i in random.sample(user_indices, min(num_likes, len(users))):
+                likes.append(Like(user=users[i], content_type='comment', object_id=comment.id, comment=comment))
+        
+        # Every like targets a row created above, so none can conflict
+        copy_insert(Like, likes)
+        
+        # bulk_create() skips the post_save signals, so apply their effects
+        # (denormalized counts and karma events) in bulk as well
+        posts_by_id = {post.id: post for post in posts}
+        comments_by_id = {comment.id: comment for comment in comments}
+        
+        for comment in comments:
+            comment.post.comment_count += 1
+        
+        karma_events = []
+        for like in likes:
+            if like.content_type == 'post':
+                target, points = posts_by_id[like.object_id], 5
+            else:
+                target, points = comments_by_id[like.object_id], 1
+            target.like_count += 1
+            karma_events.append(KarmaEvent(
+                user=target.author,
+                event_type=f"{like.content_type.upper()}_LIKE",
+                source_id=like.object_id,
+                points=points
+            ))
+        
+        Post.objects.bulk_update(posts, ['like_count', 'comment_count'])
+        Comment.objects.bulk_update(comments, ['like_count'])
+        copy_insert(KarmaEvent, karma_events)
         
         self.stdout.write(
             self.style.SUCCESS(
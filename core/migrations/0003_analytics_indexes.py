@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-15 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_post_image_post_video'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='core_commen_author__87794d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='core_post_author__75f594_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['author', 'created_at'], name='core_commen_author__a55bfb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['created_at'], name='core_commen_created_97080c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['user', 'created_at'], name='core_like_user_id_69ba95_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'created_at'], name='core_post_author__a786a4_idx'),
+        ),
+    ]
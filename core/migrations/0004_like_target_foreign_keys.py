@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-15 21:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_like_targets(apps, schema_editor):
+    """Point existing likes at their post/comment (orphaned likes stay NULL)"""
+    Like = apps.get_model('core', 'Like')
+    Post = apps.get_model('core', 'Post')
+    Comment = apps.get_model('core', 'Comment')
+    
+    Like.objects.filter(
+        content_type='post', object_id__in=Post.objects.values('id')
+    ).update(post_id=models.F('object_id'))
+    Like.objects.filter(
+        content_type='comment', object_id__in=Comment.objects.values('id')
+    ).update(comment_id=models.F('object_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_analytics_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='like',
+            name='comment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='core.comment'),
+        ),
+        migrations.AddField(
+            model_name='like',
+            name='post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='core.post'),
+        ),
+        migrations.RunPython(backfill_like_targets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-15 23:40
+
+from django.db import migrations, models
+
+
+def backfill_comment_depth(apps, schema_editor):
+    """
+    Set depth on existing comments, one UPDATE per tree level.
+    
+    Every comment starts at 0. Each pass moves the comments whose parent is
+    at ``level`` to ``level + 1``; after pass k every comment up to depth
+    k + 1 is correct, so it stops once a pass changes nothing.
+    """
+    Comment = apps.get_model('core', 'Comment')
+    level = 0
+    while Comment.objects.filter(parent__depth=level).exclude(depth=level + 1).update(depth=level + 1):
+        level += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_like_target_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_comment_depth, migrations.RunPython.noop),
+    ]
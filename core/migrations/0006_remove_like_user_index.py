@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 00:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_comment_depth'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='like',
+            name='core_like_user_id_a989fd_idx',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-16 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_remove_like_user_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='karmaevent',
+            name='core_karmae_created_5e250c_idx',
+        ),
+        migrations.AddIndex(
+            model_name='karmaevent',
+            index=models.Index(fields=['created_at', 'user', 'points'], name='core_karmae_created_9d324a_idx'),
+        ),
+    ]
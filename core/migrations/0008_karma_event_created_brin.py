@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-16 01:10
+
+from django.db import migrations
+
+
+BRIN_INDEX = 'core_karmaevent_created_brin'
+
+
+def create_brin_index(apps, schema_editor):
+    """
+    BRIN index on KarmaEvent.created_at (PostgreSQL only).
+    
+    Karma events are append-only, so created_at follows the physical row
+    order and a BRIN index - a few pages of per-block min/max summaries -
+    narrows the 24h leaderboard window to the newest blocks of the table.
+    Other backends keep just the btree index.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {BRIN_INDEX} ON core_karmaevent USING brin (created_at)'
+    )
+
+
+def drop_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {BRIN_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_karma_event_leaderboard_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_brin_index, drop_brin_index),
+    ]
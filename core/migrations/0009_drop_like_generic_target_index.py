@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 01:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_karma_event_created_brin'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='like',
+            name='core_like_content_efd6eb_idx',
+        ),
+    ]
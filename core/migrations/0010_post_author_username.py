@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-16 02:05
+
+from django.db import migrations, models
+
+
+def backfill_author_username(apps, schema_editor):
+    Post = apps.get_model('core', 'Post')
+    User = apps.get_model('auth', 'User')
+    Post.objects.update(author_username=models.Subquery(
+        User.objects.filter(pk=models.OuterRef('author_id')).values('username')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0009_drop_like_generic_target_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='author_username',
+            field=models.CharField(default='', editable=False, max_length=150),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_author_username, migrations.RunPython.noop),
+    ]
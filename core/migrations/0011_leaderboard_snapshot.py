@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-16 02:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0010_post_author_username'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('karma_24h', models.IntegerField(db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_snapshot', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-16 03:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Formerly created the PostgreSQL-only core_comment_tree_json() function.
+    
+    That path was dropped; the migration is kept as a no-op so the graph
+    stays linear for databases that already applied it.
+    """
+
+    dependencies = [
+        ('core', '0011_leaderboard_snapshot'),
+    ]
+
+    operations = []
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-16 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_comment_tree_json_function'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='karmaevent',
+            name='core_karmae_user_id_69ba23_idx',
+        ),
+        migrations.AddIndex(
+            model_name='karmaevent',
+            index=models.Index(fields=['user', 'created_at', 'points'], name='core_karmae_user_id_2e3f16_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-16 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_karma_event_user_points_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='core_post_created_84f629_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='core_post_created_1e8110_idx'),
+        ),
+    ]
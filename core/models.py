@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.db.models import Sum, Q
 from django.utils import timezone
 from datetime import timedelta
+from functools import partial
 import os
 
 
@@ -11,12 +12,44 @@ def post_media_upload_path(instance, filename):
     return f'posts/{instance.author.username}/{filename}'
 
 
+class AuthorSelectingManager(models.Manager):
+    """
+    Default manager that joins the author into every query.
+    
+    Serializers and __str__ read author fields for every row, so loading it
+    up front means no code path can fall into a per-row author lookup.
+    Queries that don't need the author can opt out with select_related(None).
+    """
+    def get_queryset(self):
+        return super().get_queryset().select_related('author')
+
+
+class PostQuerySet(models.QuerySet):
+    def with_media_type(self):
+        """
+        Annotate ``media_type`` ('image', 'video' or None) in SQL.
+        
+        Same answer as Post.get_media_type(), computed with the rows instead
+        of per object in Python.
+        """
+        return self.annotate(media_type=models.Case(
+            # Posts from before migration 0002 have NULL media, not ''
+            models.When(Q(image__isnull=False) & ~Q(image=''), then=models.Value('image')),
+            models.When(Q(video__isnull=False) & ~Q(video=''), then=models.Value('video')),
+            default=None,
+            output_field=models.CharField(),
+        ))
+
+
 class Post(models.Model):
     """
     Post model with denormalized counts for performance and media support.
     Counts are updated via signals to maintain consistency.
     """
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
+    # Copy of author.username (kept in sync by a signal on User) so listings
+    # like the admin and __str__ don't need to join auth_user
+    author_username = models.CharField(max_length=150, editable=False)
     content = models.TextField()
     
     # Media fields
@@ -30,15 +63,22 @@ class Post(models.Model):
     like_count = models.PositiveIntegerField(default=0)
     comment_count = models.PositiveIntegerField(default=0)
     
+    objects = AuthorSelectingManager.from_queryset(PostQuerySet)()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['-created_at']),
-            models.Index(fields=['author']),
+            models.Index(fields=['-created_at', '-id']),  # Feed cursor pagination
+            models.Index(fields=['author', 'created_at']),  # Per-author activity (also covers author lookups)
         ]
     
     def __str__(self):
-        return f"Post by {self.author.username}: {self.content[:50]}..."
+        return f"Post by {self.author_username}: {self.content[:50]}..."
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.author_username = self.author.username
+        super().save(*args, **kwargs)
     
     @property
     def has_media(self):
@@ -80,32 +120,40 @@ class Comment(models.Model):
     # Denormalized count for performance
     like_count = models.PositiveIntegerField(default=0)
     
+    # Denormalized nesting level (0 for root comments), set on insert so
+    # reading it never walks the parent chain
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    
+    objects = AuthorSelectingManager()
+    
     class Meta:
         ordering = ['created_at']  # Chronological order within each level
         indexes = [
             models.Index(fields=['post', 'parent']),  # For efficient tree queries
             models.Index(fields=['post', 'created_at']),
-            models.Index(fields=['author']),
+            models.Index(fields=['author', 'created_at']),  # Per-author activity (also covers author lookups)
+            models.Index(fields=['created_at']),  # For daily stats
         ]
     
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.id}"
     
-    @property
-    def depth(self):
-        """Calculate comment depth for display purposes"""
-        depth = 0
-        parent = self.parent
-        while parent:
-            depth += 1
-            parent = parent.parent
-        return depth
+    def save(self, *args, **kwargs):
+        # Replies sit one level below their parent; a comment never moves
+        if self._state.adding:
+            self.depth = self.parent.depth + 1 if self.parent_id else 0
+        super().save(*args, **kwargs)
 
 
 class Like(models.Model):
     """
     Polymorphic likes for both posts and comments.
     Uses database constraints to prevent duplicate likes.
+    
+    Alongside the generic (content_type, object_id) pair, the target is also
+    stored as a real foreign key (post or comment, set on save). That gives
+    the planner an indexed join path (e.g. ``Like.objects.filter(post__author=u)``)
+    and Post/Comment a ``likes`` reverse relation usable with prefetch_related.
     """
     CONTENT_TYPE_CHOICES = [
         ('post', 'Post'),
@@ -115,6 +163,8 @@ class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes')
     content_type = models.CharField(max_length=10, choices=CONTENT_TYPE_CHOICES)
     object_id = models.PositiveIntegerField()
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, related_name='likes')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True, related_name='likes')
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -126,13 +176,39 @@ class Like(models.Model):
             )
         ]
         indexes = [
-            models.Index(fields=['content_type', 'object_id']),
-            models.Index(fields=['user']),
+            # Likes of one post/comment are found through the post/comment
+            # foreign key indexes, so (content_type, object_id) needs none.
+            # No separate user index: the unique constraint above leads with
+            # user and already serves user lookups, including is_liked checks
+            models.Index(fields=['user', 'created_at']),  # For per-user activity
             models.Index(fields=['created_at']),  # For karma calculations
         ]
     
     def __str__(self):
         return f"{self.user.username} likes {self.content_type} {self.object_id}"
+    
+    @classmethod
+    def liked_by(cls, user, content_type):
+        """
+        Expression for annotating whether ``user`` liked each Post or Comment.
+        
+        An EXISTS subquery on the (user, content_type, object_id) unique
+        index, so is_liked for a whole queryset comes back with its rows
+        instead of one query per object.
+        """
+        if not user.is_authenticated:
+            return models.Value(False)
+        return models.Exists(cls.objects.filter(
+            user=user, content_type=content_type, object_id=models.OuterRef('pk')
+        ))
+    
+    def save(self, *args, **kwargs):
+        # Keep the typed foreign key in step with content_type/object_id
+        if self.content_type == 'post':
+            self.post_id = self.object_id
+        elif self.content_type == 'comment':
+            self.comment_id = self.object_id
+        super().save(*args, **kwargs)
 
 
 class KarmaEvent(models.Model):
@@ -162,8 +238,12 @@ class KarmaEvent(models.Model):
     
     class Meta:
         indexes = [
-            models.Index(fields=['user', 'created_at']),  # For user karma queries
-            models.Index(fields=['created_at']),  # For time-based queries
+            # For user karma queries; points rides along so per-user sums
+            # (total and last 24h) are answered from the index alone
+            models.Index(fields=['user', 'created_at', 'points']),
+            # For time-based queries; user and points ride along so the
+            # leaderboard aggregate can be answered from the index alone
+            models.Index(fields=['created_at', 'user', 'points']),
             models.Index(fields=['event_type', 'source_id']),  # For preventing duplicates
         ]
     
@@ -179,21 +259,112 @@ class KarmaEvent(models.Model):
             created_at__gte=since
         ).aggregate(total=Sum('points'))['total'] or 0
     
+    @classmethod
+    def get_user_karma_totals(cls, user):
+        """``{'karma_24h', 'total_karma'}`` for a user, in one aggregate query"""
+        since = timezone.now() - timedelta(hours=24)
+        totals = cls.objects.filter(user=user).aggregate(
+            karma_24h=Sum('points', filter=Q(created_at__gte=since)),
+            total_karma=Sum('points'),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+    
+    @classmethod
+    def karma_last_24h(cls):
+        """``{'user_id', 'karma_24h'}`` rows for the last 24 hours, best first"""
+        since = timezone.now() - timedelta(hours=24)
+        return (
+            cls.objects.filter(created_at__gte=since)
+            .values('user_id')
+            .annotate(karma_24h=Sum('points'))
+            .order_by('-karma_24h')
+        )
+    
     @classmethod
     def get_leaderboard_last_24h(cls, limit=5):
         """
         Get top users by karma in last 24 hours.
         
-        This is the key optimization challenge - must be a single efficient query.
-        Uses Django ORM aggregation to avoid N+1 queries.
+        Karma is summed over the narrow (user_id, points) event rows first,
+        then only the top ``limit`` users are loaded - 2 queries, and the
+        GROUP BY never carries the wide user columns.
+        
+        Returns a list of users with a ``karma_24h`` attribute, best first.
         """
-        since = timezone.now() - timedelta(hours=24)
+        top = list(cls.karma_last_24h()[:limit])
+        if not top:
+            return []
         
-        return User.objects.filter(
-            karma_events__created_at__gte=since
-        ).annotate(
-            karma_24h=Sum('karma_events__points')
-        ).order_by('-karma_24h')[:limit]
+        # Only the columns LeaderboardSerializer renders
+        users = User.objects.only(
+            'id', 'username', 'first_name', 'last_name'
+        ).in_bulk([row['user_id'] for row in top])
+        
+        leaderboard = []
+        for row in top:
+            user = users[row['user_id']]
+            user.karma_24h = row['karma_24h']
+            leaderboard.append(user)
+        return leaderboard
+
+
+class LeaderboardSnapshot(models.Model):
+    """
+    Precomputed 24h karma per user, rebuilt by ``manage.py refresh_leaderboard``.
+    
+    Run the command from cron every minute or so; the leaderboard is then
+    an indexed ORDER BY ... LIMIT over this small table instead of a
+    SUM/GROUP BY over a day of karma events. A snapshot older than MAX_AGE
+    is ignored so a stopped cron job can't serve a frozen leaderboard.
+    """
+    MAX_AGE = timedelta(minutes=5)
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='leaderboard_snapshot')
+    karma_24h = models.IntegerField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.karma_24h} karma (24h)"
+    
+    @classmethod
+    def refresh(cls):
+        """Replace the snapshot with the current 24h totals; returns the row count"""
+        started = timezone.now()
+        rows = [
+            cls(user_id=row['user_id'], karma_24h=row['karma_24h'])
+            for row in KarmaEvent.karma_last_24h()
+        ]
+        with transaction.atomic():
+            # Upsert everyone with karma in the window, then drop the users
+            # the upsert didn't touch (no karma in the last 24h any more)
+            cls.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['karma_24h', 'updated_at']
+            )
+            cls.objects.filter(updated_at__lt=started).delete()
+        return len(rows)
+    
+    @classmethod
+    def top(cls, limit=5):
+        """
+        Top users from the snapshot, like KarmaEvent.get_leaderboard_last_24h().
+        
+        Returns None when the snapshot is empty or stale, so callers can fall
+        back to the live query.
+        """
+        rows = list(
+            cls.objects.select_related('user')
+            .only('karma_24h', 'updated_at', 'user__id', 'user__username', 'user__first_name', 'user__last_name')
+            .order_by('-karma_24h')[:limit]
+        )
+        if not rows or rows[0].updated_at < timezone.now() - cls.MAX_AGE:
+            return None
+        
+        for row in rows:
+            row.user.karma_24h = row.karma_24h
+        return [row.user for row in rows]
 
 
 # Signal handlers for maintaining denormalized counts
@@ -205,73 +376,63 @@ from django.dispatch import receiver
 def create_karma_event_and_update_counts(sender, instance, created, **kwargs):
     """
     When a like is created:
-    1. Create corresponding karma event
-    2. Update denormalized like counts
-    3. Handle concurrency with select_for_update
+    1. Update denormalized like counts with an atomic F() increment - no
+       row lock, so likes on a hot post don't queue up behind each other
+    2. Create the corresponding karma event once the like has committed
+    
+    Karma only feeds the leaderboard and profile totals, so it is written
+    from a transaction.on_commit() callback rather than inside the like's
+    transaction. That only defers it until commit: the callback still runs
+    synchronously in the request's worker. There is no task queue here;
+    if one is added, the callback is where to hand karma over to it.
     """
     if not created:
         return
     
     # Determine karma points and target object
     if instance.content_type == 'post':
-        points = 5
-        try:
-            post = Post.objects.select_for_update().get(id=instance.object_id)
-            post.like_count += 1
-            post.save(update_fields=['like_count'])
-            target_user = post.author
-        except Post.DoesNotExist:
-            return
+        model, points = Post, 5
     else:  # comment
-        points = 1
-        try:
-            comment = Comment.objects.select_for_update().get(id=instance.object_id)
-            comment.like_count += 1
-            comment.save(update_fields=['like_count'])
-            target_user = comment.author
-        except Comment.DoesNotExist:
-            return
+        model, points = Comment, 1
+    
+    target = model.objects.filter(id=instance.object_id)
+    target_user_id = target.values_list('author_id', flat=True).first()
+    if target_user_id is None:
+        return
+    target.update(like_count=models.F('like_count') + 1)
     
     # Create karma event for the content author (not the liker)
-    KarmaEvent.objects.create(
-        user=target_user,
+    transaction.on_commit(partial(
+        KarmaEvent.objects.create,
+        user_id=target_user_id,
         event_type=f"{instance.content_type.upper()}_LIKE",
         source_id=instance.object_id,
         points=points
-    )
+    ))
 
 
 @receiver(post_delete, sender=Like)
 def remove_karma_event_and_update_counts(sender, instance, **kwargs):
     """
     When a like is deleted (unlike):
-    1. Remove corresponding karma event
-    2. Update denormalized like counts
+    1. Update denormalized like counts with an atomic F() decrement; the
+       like_count > 0 filter keeps it from going negative without a lock
+    2. Remove the corresponding karma event on commit, queued behind the
+       creation callback of a like made in the same transaction
     """
-    # Update counts
-    if instance.content_type == 'post':
-        try:
-            post = Post.objects.select_for_update().get(id=instance.object_id)
-            post.like_count = max(0, post.like_count - 1)
-            post.save(update_fields=['like_count'])
-            target_user = post.author
-        except Post.DoesNotExist:
-            return
-    else:  # comment
-        try:
-            comment = Comment.objects.select_for_update().get(id=instance.object_id)
-            comment.like_count = max(0, comment.like_count - 1)
-            comment.save(update_fields=['like_count'])
-            target_user = comment.author
-        except Comment.DoesNotExist:
-            return
+    model = Post if instance.content_type == 'post' else Comment
+    target = model.objects.filter(id=instance.object_id)
+    target_user_id = target.values_list('author_id', flat=True).first()
+    if target_user_id is None:
+        return
+    target.filter(like_count__gt=0).update(like_count=models.F('like_count') - 1)
     
     # Remove karma event
-    KarmaEvent.objects.filter(
-        user=target_user,
+    transaction.on_commit(KarmaEvent.objects.filter(
+        user_id=target_user_id,
         event_type=f"{instance.content_type.upper()}_LIKE",
         source_id=instance.object_id
-    ).delete()
+    ).delete)
 
 
 @receiver(post_save, sender=Comment)
@@ -288,4 +449,14 @@ def decrease_post_comment_count(sender, instance, **kwargs):
     """Update post comment count when comment is deleted"""
     Post.objects.filter(id=instance.post.id).update(
         comment_count=models.F('comment_count') - 1
-    )
\ No newline at end of file
+    )
+
+
+@receiver(post_save, sender=User)
+def sync_post_author_username(sender, instance, created, update_fields=None, **kwargs):
+    """Propagate a username change to the user's posts (renames are rare)"""
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    Post.objects.filter(author=instance).exclude(
+        author_username=instance.username
+    ).update(author_username=instance.username)
@@ -28,10 +28,16 @@ Moderation Features to Implement:
    - Appeal process
 """
 
-from django.db import models
+from django.db import DatabaseError, models, transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.utils import timezone
+from datetime import datetime
 import re
+import time
 
 class ModerationRule(models.Model):
     RULE_TYPES = [
@@ -95,8 +101,64 @@ class ContentReport(models.Model):
     reviewed_at = models.DateTimeField(null=True, blank=True)
     moderator_notes = models.TextField(blank=True)
     
+    # Reports against a user on the last RECENT_DAYS days (today included)
+    # count towards auto-escalation
+    RECENT_DAYS = 7
+    
     def __str__(self):
         return f"Report: {self.reason} - {self.content_type} {self.object_id}"
+    
+    # Per-user daily report counts live in the cache as
+    # ``reports:<user>:<date>``, so the recent count is a sum of RECENT_DAYS
+    # buckets however many reports were ever filed
+    @staticmethod
+    def _report_bucket_key(user_id, date):
+        return f'reports:{user_id}:{date.isoformat()}'
+    
+    @classmethod
+    def count_recent_report(cls, report):
+        """Count a new report in its user's bucket for the day"""
+        date = report.created_at.date()
+        try:
+            cache.incr(cls._report_bucket_key(report.reported_user_id, date))
+        except ValueError:
+            # Missing: seed from the database, which already includes this report
+            cls._seed_report_buckets(report.reported_user_id, [date])
+    
+    @classmethod
+    def recent_report_count(cls, user_id):
+        """Reports against a user on the last RECENT_DAYS days - one cache read when warm"""
+        today = timezone.now().date()
+        dates = [today - timezone.timedelta(days=n) for n in range(cls.RECENT_DAYS)]
+        keys = {cls._report_bucket_key(user_id, date): date for date in dates}
+        counts = cache.get_many(keys)
+        total = sum(counts.values())
+        missing = [date for key, date in keys.items() if key not in counts]
+        if missing:
+            total += sum(cls._seed_report_buckets(user_id, missing))
+        return total
+    
+    @classmethod
+    def _seed_report_buckets(cls, user_id, dates):
+        """Count a user's reports on each of ``dates`` in one query and cache them"""
+        def day_start(date):
+            return timezone.make_aware(datetime.combine(date, datetime.min.time()))
+        
+        def on_date(date):
+            return Q(created_at__gte=day_start(date), created_at__lt=day_start(date + timezone.timedelta(days=1)))
+        
+        counts = cls.objects.filter(
+            reported_user_id=user_id,
+            created_at__gte=day_start(min(dates)),
+        ).aggregate(**{
+            f'day_{i}': Count('pk', filter=on_date(date)) for i, date in enumerate(dates)
+        })
+        counts = [counts[f'day_{i}'] for i in range(len(dates))]
+        # A bucket is read until the day is RECENT_DAYS old
+        timeout = int(timezone.timedelta(days=cls.RECENT_DAYS + 1).total_seconds())
+        for date, count in zip(dates, counts):
+            cache.add(cls._report_bucket_key(user_id, date), count, timeout)
+        return counts
 
 class ModerationAction(models.Model):
     ACTION_TYPES = [
@@ -146,25 +208,37 @@ class UserWarning(models.Model):
     def __str__(self):
         return f"Warning for {self.user.username}: {self.reason[:50]}"
 
+PROFANITY_WORDS = [
+    # Add your profanity word list here
+    'badword1', 'badword2', 'badword3'
+]
+
+# All words as one case-insensitive alternation: one scan of the text tells
+# whether any word is present, so clean text (the common case) skips the
+# per-word checks entirely
+_PROFANITY_RE = re.compile('|'.join(map(re.escape, PROFANITY_WORDS)), re.IGNORECASE)
+
+# Links, and runs of 5+ identical characters. Kept as separate patterns:
+# a single alternation would let a link swallow a run inside it (and a run
+# swallow the start of a link), so each is searched over the whole text.
+_LINK_RE = re.compile(
+    r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|(?:%[0-9a-fA-F]{2}))+'
+)
+_REPEAT_RE = re.compile(r'(.)\1{4,}')
+
 class ContentFilter:
     """Automated content filtering system"""
     
     @staticmethod
     def check_profanity(text):
         """Check for profanity in text"""
-        profanity_words = [
-            # Add your profanity word list here
-            'badword1', 'badword2', 'badword3'
-        ]
+        if not _PROFANITY_RE.search(text):
+            return []
         
+        # Each word is reported once, in list order - including words that
+        # only occur inside a longer one
         text_lower = text.lower()
-        found_words = []
-        
-        for word in profanity_words:
-            if word in text_lower:
-                found_words.append(word)
-        
-        return found_words
+        return [word for word in PROFANITY_WORDS if word in text_lower]
     
     @staticmethod
     def check_spam(text, user):
@@ -172,63 +246,129 @@ class ContentFilter:
         spam_indicators = []
         
         # Check for excessive links
-        link_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-        links = re.findall(link_pattern, text)
-        if len(links) > 3:
+        if len(_LINK_RE.findall(text)) > 3:
             spam_indicators.append('excessive_links')
         
         # Check for repeated characters
-        if re.search(r'(.)\1{4,}', text):
+        if _REPEAT_RE.search(text):
             spam_indicators.append('repeated_characters')
         
-        # Check for excessive caps
-        caps_ratio = sum(1 for c in text if c.isupper()) / len(text) if text else 0
-        if caps_ratio > 0.7 and len(text) > 10:
+        # Check for excessive caps (map() keeps the per-character loop in C)
+        if len(text) > 10 and sum(map(str.isupper, text)) / len(text) > 0.7:
             spam_indicators.append('excessive_caps')
         
-        # Check posting frequency
+        # Check posting frequency - posts and comments counted in one
+        # statement (UNION ALL, so a post and comment sharing an id both count)
         from .models import Post, Comment
-        recent_posts = Post.objects.filter(
-            author=user,
-            created_at__gte=timezone.now() - timezone.timedelta(minutes=5)
-        ).count()
-        
-        recent_comments = Comment.objects.filter(
-            author=user,
-            created_at__gte=timezone.now() - timezone.timedelta(minutes=5)
-        ).count()
+        since = timezone.now() - timezone.timedelta(minutes=5)
+        recent_activity = (
+            Post.objects.filter(author=user, created_at__gte=since).order_by().values_list('id')
+            .union(
+                Comment.objects.filter(author=user, created_at__gte=since).order_by().values_list('id'),
+                all=True
+            )
+            .count()
+        )
         
-        if recent_posts + recent_comments > 10:
+        if recent_activity > 10:
             spam_indicators.append('high_frequency')
         
         return spam_indicators
     
-    @staticmethod
-    def moderate_content(text, user, content_type='post'):
+    # Rule types whose ModerationRule.pattern is a regex (the others hold
+    # JSON config) and so can be compiled into the pipeline
+    REGEX_RULE_TYPES = ('profanity', 'spam', 'link')
+    
+    # Compiled (severity, type, check) steps, built on first use. Each
+    # process keeps its own copy, tagged with the shared rules version it was
+    # built from; any process changing a ModerationRule bumps that version in
+    # the cache, so every process recompiles on its next use.
+    PIPELINE_VERSION_KEY = 'moderation:pipeline:version'
+    _pipeline = None
+    _pipeline_version = None
+    
+    @classmethod
+    def get_pipeline(cls):
+        # A missing key (evicted or flushed) is re-seeded with a fresh value,
+        # so it can't collide with a version some process already holds
+        version = cache.get_or_set(cls.PIPELINE_VERSION_KEY, time.time_ns, None)
+        if cls._pipeline is None or cls._pipeline_version != version:
+            cls._pipeline = cls._compile_pipeline()
+            cls._pipeline_version = version
+        return cls._pipeline
+    
+    @classmethod
+    def invalidate_pipeline(cls):
+        try:
+            cache.incr(cls.PIPELINE_VERSION_KEY)
+        except ValueError:
+            # Nothing compiled against a missing version; the next
+            # get_pipeline() seeds a new one
+            pass
+    
+    @classmethod
+    def _load_rules(cls):
+        """Active regex rules, or none when the rules table can't be read"""
+        try:
+            # Savepoint, so a failed query doesn't break an outer transaction
+            with transaction.atomic():
+                return list(ModerationRule.objects.filter(is_active=True, rule_type__in=cls.REGEX_RULE_TYPES))
+        except DatabaseError:
+            # E.g. the moderation tables aren't migrated - run the built-in
+            # checks only
+            return []
+    
+    @classmethod
+    def _compile_pipeline(cls):
+        """
+        Built-in checks plus every active regex ModerationRule, compiled once.
+        
+        Each step is a ``check(text, user)`` callable returning a list of
+        details (empty when clean). Steps run most severe first, so the
+        pipeline can stop as soon as a rejecting issue is found.
+        """
+        steps = [
+            (3, 'profanity', lambda text, user: cls.check_profanity(text)),
+            (2, 'spam', cls.check_spam),
+        ]
+        
+        for rule in cls._load_rules():
+            try:
+                pattern = re.compile(rule.pattern, re.IGNORECASE)
+            except re.error:
+                continue
+            steps.append((
+                rule.severity,
+                rule.rule_type,
+                lambda text, user, pattern=pattern, name=rule.name: [name] if pattern.search(text) else []
+            ))
+        
+        # Stable sort keeps the built-in checks ahead of rules of equal severity
+        steps.sort(key=lambda step: step[0], reverse=True)
+        return steps
+    
+    @classmethod
+    def moderate_content(cls, text, user, content_type='post'):
         """Main content moderation function"""
         issues = []
+        max_severity = 0
         
-        # Check profanity
-        profanity = ContentFilter.check_profanity(text)
-        if profanity:
-            issues.append({
-                'type': 'profanity',
-                'severity': 3,
-                'details': profanity
-            })
-        
-        # Check spam
-        spam_indicators = ContentFilter.check_spam(text, user)
-        if spam_indicators:
+        for severity, issue_type, check in cls.get_pipeline():
+            details = check(text, user)
+            if not details:
+                continue
             issues.append({
-                'type': 'spam',
-                'severity': 2,
-                'details': spam_indicators
+                'type': issue_type,
+                'severity': severity,
+                'details': details
             })
+            max_severity = max(max_severity, severity)
+            if max_severity >= 4:
+                # Rejected whatever else matches - skip the remaining
+                # (including the DB-backed frequency) checks
+                break
         
         # Determine action based on issues
-        max_severity = max([issue['severity'] for issue in issues]) if issues else 0
-        
         if max_severity >= 4:
             return {'action': 'reject', 'issues': issues}
         elif max_severity >= 3:
@@ -241,26 +381,20 @@ class ContentFilter:
 # Moderation utility functions
 def create_moderation_report(reporter, reported_user, content_type, object_id, reason, description=''):
     """Create a new moderation report"""
-    report = ContentReport.objects.create(
+    # Auto-escalate if user has multiple recent reports. The count is taken
+    # before the insert (this report makes it +1), so the status goes in with
+    # the INSERT instead of a follow-up UPDATE.
+    recent_reports = ContentReport.recent_report_count(reported_user.id) + 1
+    
+    return ContentReport.objects.create(
         reporter=reporter,
         reported_user=reported_user,
         content_type=content_type,
         object_id=object_id,
         reason=reason,
-        description=description
+        description=description,
+        status='escalated' if recent_reports >= 3 else 'pending'
     )
-    
-    # Auto-escalate if user has multiple recent reports
-    recent_reports = ContentReport.objects.filter(
-        reported_user=reported_user,
-        created_at__gte=timezone.now() - timezone.timedelta(days=7)
-    ).count()
-    
-    if recent_reports >= 3:
-        report.status = 'escalated'
-        report.save()
-    
-    return report
 
 def issue_warning(moderator, user, reason, severity=1):
     """Issue a warning to a user"""
@@ -287,4 +421,18 @@ def issue_warning(moderator, user, reason, severity=1):
             duration=timezone.timedelta(hours=24)
         )
     
-    return warning
\ No newline at end of file
+    return warning
+
+@receiver(post_save, sender=ContentReport)
+def count_recent_report(sender, instance, created, **kwargs):
+    """Keep the reported user's running report count current"""
+    if created:
+        ContentReport.count_recent_report(instance)
+
+@receiver(post_save, sender=ModerationRule)
+@receiver(post_delete, sender=ModerationRule)
+def refresh_content_filter(sender, **kwargs):
+    """Recompile the filter pipeline with the changed rules on next use"""
+    # After commit, so no process recompiles from the old rules under the
+    # new version
+    transaction.on_commit(ContentFilter.invalidate_pipeline)
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PostCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the post feed.
+    
+    Each page is a ``created_at < cursor`` range read off the
+    (-created_at, -id) index, so deep pages cost the same as the first
+    one instead of scanning and discarding OFFSET rows. The id tiebreaker
+    keeps the order stable for posts sharing a timestamp.
+    """
+    ordering = ('-created_at', '-id')
@@ -1,3 +1,4 @@
+from collections import defaultdict
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Post, Comment, Like, KarmaEvent
@@ -17,8 +18,11 @@ class PostSerializer(serializers.ModelSerializer):
     """
     author = UserSerializer(read_only=True)
     is_liked = serializers.SerializerMethodField()
-    media_type = serializers.ReadOnlyField(source='get_media_type')
-    has_media = serializers.ReadOnlyField()
+    media_type = serializers.SerializerMethodField()
+    has_media = serializers.SerializerMethodField()
+    
+    ALLOWED_IMAGE_TYPES = frozenset({'image/jpeg', 'image/png', 'image/gif', 'image/webp'})
+    ALLOWED_VIDEO_TYPES = frozenset({'video/mp4', 'video/webm', 'video/ogg'})
     
     class Meta:
         model = Post
@@ -31,6 +35,11 @@ class PostSerializer(serializers.ModelSerializer):
     
     def get_is_liked(self, obj):
         """Check if current user has liked this post"""
+        liked_by_me = getattr(obj, 'liked_by_me', None)
+        if liked_by_me is not None:
+            # Annotated by the view with Like.liked_by()
+            return liked_by_me
+        
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Like.objects.filter(
@@ -40,6 +49,16 @@ class PostSerializer(serializers.ModelSerializer):
             ).exists()
         return False
     
+    def get_media_type(self, obj):
+        """Media type annotated by with_media_type(), else from the model"""
+        try:
+            return obj.media_type
+        except AttributeError:
+            return obj.get_media_type()
+    
+    def get_has_media(self, obj):
+        return self.get_media_type(obj) is not None
+    
     def create(self, validated_data):
         """Set author to current user"""
         validated_data['author'] = self.context['request'].user
@@ -53,13 +72,11 @@ class PostSerializer(serializers.ModelSerializer):
         
         # Validate file types
         if data.get('image'):
-            allowed_image_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
-            if hasattr(data['image'], 'content_type') and data['image'].content_type not in allowed_image_types:
+            if hasattr(data['image'], 'content_type') and data['image'].content_type not in self.ALLOWED_IMAGE_TYPES:
                 raise serializers.ValidationError("Only JPEG, PNG, GIF, and WebP images are allowed.")
         
         if data.get('video'):
-            allowed_video_types = ['video/mp4', 'video/webm', 'video/ogg']
-            if hasattr(data['video'], 'content_type') and data['video'].content_type not in allowed_video_types:
+            if hasattr(data['video'], 'content_type') and data['video'].content_type not in self.ALLOWED_VIDEO_TYPES:
                 raise serializers.ValidationError("Only MP4, WebM, and OGG videos are allowed.")
         
         return data
@@ -69,8 +86,8 @@ class CommentSerializer(serializers.ModelSerializer):
     """
     Comment serializer with nested replies support.
     
-    The replies field uses a nested serializer to build the comment tree.
-    This works efficiently when combined with prefetch_related in the view.
+    Whole trees are built with build_tree(), which serializes a flat list of
+    comments once and links the results by parent_id.
     """
     author = UserSerializer(read_only=True)
     replies = serializers.SerializerMethodField()
@@ -84,24 +101,52 @@ class CommentSerializer(serializers.ModelSerializer):
             'like_count', 'is_liked', 'depth', 'replies'
         ]
     
+    @classmethod
+    def build_tree(cls, comments, context):
+        """
+        Serialize a post's flat comment list into nested reply dicts.
+        
+        Each comment is serialized exactly once by a single serializer
+        instance - no per-node serializers and no recursion. Nodes are
+        bucketed by parent_id into ``children_map``, and get_replies hands out
+        those same lists, so replies appended after their parent was
+        serialized still show up under it.
+        
+        Returns the serialized root comments.
+        """
+        children_map = defaultdict(list)
+        serializer = cls(context={**context, 'children_map': children_map})
+        
+        roots = []
+        for comment in comments:
+            data = serializer.to_representation(comment)
+            if comment.parent_id:
+                children_map[comment.parent_id].append(data)
+            else:
+                roots.append(data)
+        return roots
+    
     def get_replies(self, obj):
         """
-        Recursively serialize nested replies.
+        Serialized replies of a comment.
         
-        This works efficiently because the view prefetches all comments
-        in a single query, so no additional DB hits occur here.
+        Inside build_tree() this is the node's bucket in the shared children
+        map, so no DB hits occur here.
         """
-        if hasattr(obj, 'prefetched_replies'):
-            # Use prefetched replies to avoid N+1 queries
-            replies = obj.prefetched_replies
-        else:
-            # Fallback for individual comment serialization
-            replies = obj.replies.all()
+        children_map = self.context.get('children_map')
+        if children_map is not None:
+            return children_map[obj.id]
         
-        return CommentSerializer(replies, many=True, context=self.context).data
+        # Fallback for individual comment serialization
+        return CommentSerializer(obj.replies.all(), many=True, context=self.context).data
     
     def get_is_liked(self, obj):
         """Check if current user has liked this comment"""
+        liked_by_me = getattr(obj, 'liked_by_me', None)
+        if liked_by_me is not None:
+            # Annotated by the view with Like.liked_by()
+            return liked_by_me
+        
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Like.objects.filter(
@@ -143,19 +188,14 @@ class LikeSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         """Set user to current user and handle idempotency"""
-        validated_data['user'] = self.context['request'].user
-        
-        # Check if like already exists (idempotent operation)
-        existing_like = Like.objects.filter(
-            user=validated_data['user'],
+        # get_or_create() retries the lookup if a concurrent request wins the
+        # INSERT race on the unique constraint, so a double-click never errors
+        like, created = Like.objects.get_or_create(
+            user=self.context['request'].user,
             content_type=validated_data['content_type'],
             object_id=validated_data['object_id']
-        ).first()
-        
-        if existing_like:
-            return existing_like
-        
-        return super().create(validated_data)
+        )
+        return like
 
 
 class LeaderboardSerializer(serializers.ModelSerializer):
@@ -1,24 +1,33 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
+from io import StringIO
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Post, Comment, Like, KarmaEvent
+from .models import Post, Comment, Like, KarmaEvent, LeaderboardSnapshot
 
 
-class LeaderboardTestCase(TestCase):
+class LeaderboardTestCase(TransactionTestCase):
     """
     Test case for leaderboard calculation logic.
     
     This tests the key requirement: efficient single-query leaderboard
     calculation for top 5 users by karma in last 24 hours.
+    
+    Karma events are written when a like commits, so these tests run
+    against real commits rather than inside a rolled-back transaction.
     """
     
     def setUp(self):
         """Set up test data"""
         self.client = APIClient()
+        cache.clear()  # the leaderboard endpoint caches its response
         
         # Create test users
         self.users = []
@@ -131,21 +140,81 @@ class LeaderboardTestCase(TestCase):
             self.assertIn('karma_24h', data[0])
             self.assertIn('username', data[0])
     
+    def test_leaderboard_api_is_cached(self):
+        """Repeat leaderboard requests are served from the cache"""
+        self.client.force_authenticate(user=self.users[0])
+        Like.objects.create(user=self.users[1], content_type='post', object_id=self.posts[0].id)
+        
+        url = reverse('leaderboard')
+        first = self.client.get(url).json()
+        
+        with self.assertNumQueries(0):
+            second = self.client.get(url).json()
+        self.assertEqual(first, second)
+        self.assertEqual(second[0]['username'], self.users[0].username)
+    
     def test_leaderboard_query_efficiency(self):
-        """Test that leaderboard uses single query"""
+        """Test that leaderboard uses one aggregate query plus one user lookup"""
         
         # Create karma events
         for i in range(10):
             Like.objects.create(
                 user=self.users[i % len(self.users)], 
                 content_type='post', 
-                object_id=self.posts[0].id
+                object_id=self.posts[i // len(self.users)].id
             )
         
         # Test query count
-        with self.assertNumQueries(1):
+        with self.assertNumQueries(2):
             leaderboard = list(KarmaEvent.get_leaderboard_last_24h(5))
     
+    def test_empty_leaderboard_is_one_query(self):
+        """With no karma in the window the user lookup is skipped entirely"""
+        with self.assertNumQueries(1):
+            self.assertEqual(KarmaEvent.get_leaderboard_last_24h(5), [])
+    
+    def test_leaderboard_loads_only_rendered_user_columns(self):
+        """Leaderboard users are loaded without unused columns like password"""
+        Like.objects.create(user=self.users[1], content_type='post', object_id=self.posts[0].id)
+        
+        with CaptureQueriesContext(connection) as queries:
+            leaderboard = KarmaEvent.get_leaderboard_last_24h(5)
+        
+        user_sql = queries.captured_queries[-1]['sql']
+        selected = user_sql.split(' FROM ')[0]
+        self.assertEqual(selected.count(','), 3)  # id, username, first_name, last_name
+        self.assertNotIn('password', selected)
+        self.assertEqual(leaderboard[0].username, self.users[0].username)
+    
+    def test_leaderboard_snapshot_matches_live_query(self):
+        """refresh_leaderboard precomputes the same ranking as the live query"""
+        Like.objects.create(user=self.users[3], content_type='post', object_id=self.posts[0].id)
+        Like.objects.create(user=self.users[4], content_type='post', object_id=self.posts[1].id)
+        Like.objects.create(user=self.users[5], content_type='post', object_id=self.posts[1].id)
+        
+        self.assertIsNone(LeaderboardSnapshot.top(5))
+        call_command('refresh_leaderboard', stdout=StringIO())
+        
+        with self.assertNumQueries(1):
+            snapshot = [(user.username, user.karma_24h) for user in LeaderboardSnapshot.top(5)]
+        live = [(user.username, user.karma_24h) for user in KarmaEvent.get_leaderboard_last_24h(5)]
+        self.assertEqual(snapshot, live)
+        self.assertEqual(snapshot[0], (self.users[1].username, 10))
+    
+    def test_user_karma_totals_in_one_query(self):
+        """user_karma returns 24h and all-time karma from a single aggregate"""
+        old_event = KarmaEvent.objects.create(
+            user=self.users[0], event_type='POST_LIKE', source_id=self.posts[0].id, points=5
+        )
+        old_event.created_at = timezone.now() - timedelta(hours=25)
+        old_event.save()
+        Like.objects.create(user=self.users[1], content_type='post', object_id=self.posts[0].id)
+        
+        self.client.force_authenticate(user=self.users[0])
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse('my-karma')).json()
+        self.assertEqual((data['karma_24h'], data['total_karma']), (5, 10))
+    
     def test_concurrent_like_operations(self):
         """Test that concurrent likes don't create duplicate karma events"""
         
@@ -208,4 +277,322 @@ class CommentTreeTestCase(TestCase):
         # Verify nested reply structure
         reply1_data = next(r for r in root1_data['replies'] if r['content'] == 'Reply 1')
         self.assertEqual(len(reply1_data['replies']), 1)
-        self.assertEqual(reply1_data['replies'][0]['content'], 'Nested')
\ No newline at end of file
+        self.assertEqual(reply1_data['replies'][0]['content'], 'Nested')
+    
+    def test_comment_tree_loads_only_rendered_columns(self):
+        """The post and comments load without unused author columns and nothing is refetched"""
+        root = Comment.objects.create(post=self.post, author=self.user, content='Root')
+        Comment.objects.create(post=self.post, author=self.user, parent=root, content='Reply')
+        Like.objects.create(user=self.user, content_type='comment', object_id=root.id)
+        
+        url = reverse('post-comments', kwargs={'pk': self.post.id})
+        
+        # Post and all comments - no deferred-field loads
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(queries), 2)
+        
+        post_sql, comment_sql = (query['sql'] for query in queries.captured_queries)
+        self.assertIn('core_comment', comment_sql.split(' FROM ')[1])
+        self.assertNotIn('password', post_sql)
+        self.assertNotIn('password', comment_sql)
+        root_data = response.json()['comments'][0]
+        self.assertEqual(root_data['author']['username'], self.user.username)
+        self.assertTrue(root_data['is_liked'])
+        self.assertFalse(root_data['replies'][0]['is_liked'])
+
+    def test_comment_depth_is_stored(self):
+        """Depth is set on insert and read without walking the parent chain"""
+        root = Comment.objects.create(post=self.post, author=self.user, content='Root')
+        reply = Comment.objects.create(post=self.post, author=self.user, parent=root, content='Reply')
+        nested = Comment.objects.create(post=self.post, author=self.user, parent=reply, content='Nested')
+        
+        nested = Comment.objects.get(pk=nested.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(nested.depth, 2)
+        self.assertEqual(root.depth, 0)
+
+
+class PostListTestCase(TestCase):
+    """Test the post feed: is_liked N+1 prevention, media types and pagination"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        
+        self.posts = [
+            Post.objects.create(author=self.user, content=f'Post {i}')
+            for i in range(5)
+        ]
+        Like.objects.create(user=self.user, content_type='post', object_id=self.posts[0].id)
+    
+    def test_post_list_is_liked_query_efficiency(self):
+        """is_liked for the whole page is annotated onto the posts query"""
+        url = reverse('post-list-create')
+        
+        # Just the page of posts - cursor pagination runs no COUNT, and
+        # there's no per-post or separate likes query
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        liked = {post['id']: post['is_liked'] for post in response.json()['results']}
+        self.assertTrue(liked[self.posts[0].id])
+        self.assertFalse(liked[self.posts[1].id])
+    
+    def test_media_type_annotation_handles_null_media(self):
+        """Posts with NULL media (pre-0002 rows) have no media_type"""
+        Post.objects.filter(pk=self.posts[0].pk).update(image=None, video=None)
+        Post.objects.filter(pk=self.posts[1].pk).update(image='posts/testuser/a.png', video=None)
+        Post.objects.filter(pk=self.posts[2].pk).update(image=None, video='posts/testuser/a.mp4')
+        
+        results = {post['id']: post for post in self.client.get(reverse('post-list-create')).json()['results']}
+        for post in Post.objects.with_media_type():
+            self.assertEqual(post.media_type, post.get_media_type())
+            self.assertEqual(results[post.id]['media_type'], post.get_media_type())
+            self.assertEqual(results[post.id]['has_media'], post.get_media_type() is not None)
+        self.assertIsNone(results[self.posts[0].id]['media_type'])
+        self.assertEqual(results[self.posts[1].id]['media_type'], 'image')
+        self.assertEqual(results[self.posts[2].id]['media_type'], 'video')
+    
+    def test_post_list_cursor_pagination(self):
+        """Following the next cursor walks the feed newest-first without repeats"""
+        Post.objects.bulk_create([
+            Post(author=self.user, author_username=self.user.username, content=f'Extra {i}')
+            for i in range(20)
+        ])
+        
+        seen = []
+        url = reverse('post-list-create')
+        while url:
+            data = self.client.get(url).json()
+            self.assertNotIn('count', data)
+            seen.extend(post['id'] for post in data['results'])
+            url = data['next']
+        
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+
+class LikeToggleTestCase(TestCase):
+    """Test the like/unlike toggle endpoints"""
+    
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='testpass123')
+        self.user = User.objects.create_user('liker', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        
+        self.post = Post.objects.create(author=self.author, content='Test post')
+    
+    def test_like_post_toggles(self):
+        """A second like request removes the like and its karma"""
+        url = reverse('like-post', kwargs={'pk': self.post.id})
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url)
+        self.assertEqual(response.json(), {'liked': True, 'like_count': 1})
+        self.assertEqual(KarmaEvent.objects.filter(user=self.author).count(), 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url)
+        self.assertEqual(response.json(), {'liked': False, 'like_count': 0})
+        self.assertFalse(KarmaEvent.objects.filter(user=self.author).exists())
+    
+    def test_like_missing_post_returns_404(self):
+        url = reverse('like-post', kwargs={'pk': self.post.id + 1})
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_like_post_deleted_during_toggle_returns_404(self):
+        from unittest import mock
+        from . import views
+        
+        def toggle_and_delete(*args):
+            Post.objects.filter(pk=self.post.id).delete()
+            return True
+        
+        url = reverse('like-post', kwargs={'pk': self.post.id})
+        with mock.patch.object(views, 'toggle_like', side_effect=toggle_and_delete):
+            self.assertEqual(self.client.post(url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ContentFilterTestCase(TestCase):
+    """Test the moderation text checks"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('writer', password='testpass123')
+    
+    def test_check_profanity(self):
+        """Each listed word is reported once, in list order, case-insensitively"""
+        from .moderation import ContentFilter
+        
+        self.assertEqual(ContentFilter.check_profanity('all clean here'), [])
+        self.assertEqual(
+            ContentFilter.check_profanity('BADWORD3 then badword1, badword3 again'),
+            ['badword1', 'badword3']
+        )
+        self.assertEqual(ContentFilter.check_profanity('xxbadword2xx'), ['badword2'])
+    
+    def test_check_spam_links_and_repeats(self):
+        """Links and repeated characters are found independently of each other"""
+        from .moderation import ContentFilter
+        
+        def check(text):
+            return ContentFilter.check_spam(text, self.user)
+        
+        self.assertEqual(check('a perfectly normal sentence'), [])
+        # Runs inside or right before a link still count as repeats
+        self.assertEqual(check('http://cheap.example.com/!!!!!!!!'), ['repeated_characters'])
+        self.assertEqual(check('http://wwwww.example.com'), ['repeated_characters'])
+        # A run doesn't hide the link that starts inside it
+        self.assertEqual(
+            check('hhhhhttp://a.com http://b.com http://c.com http://d.com'),
+            ['excessive_links', 'repeated_characters']
+        )
+        self.assertEqual(check('http://a.com http://b.com http://c.com'), [])
+        self.assertEqual(check('http://a.com http://b.com http://c.com http://d.com'), ['excessive_links'])
+    
+    def test_check_spam_caps_and_frequency(self):
+        from .moderation import ContentFilter
+        
+        self.assertEqual(ContentFilter.check_spam('THIS IS LOUD TEXT', self.user), ['excessive_caps'])
+        self.assertEqual(ContentFilter.check_spam('SHORT', self.user), [])
+        
+        post = Post.objects.create(author=self.user, content='Post')
+        for i in range(10):
+            Comment.objects.create(post=post, author=self.user, content=f'Comment {i}')
+        self.assertEqual(ContentFilter.check_spam('hello there', self.user), ['high_frequency'])
+    
+    def test_pipeline_recompiles_when_another_process_changes_rules(self):
+        """The compiled pipeline follows the shared version, not process state"""
+        from unittest import mock
+        from .moderation import ContentFilter
+        
+        cache.clear()
+        self.addCleanup(setattr, ContentFilter, '_pipeline', None)
+        with mock.patch.object(ContentFilter, '_compile_pipeline', side_effect=lambda: []) as compile_pipeline:
+            ContentFilter.get_pipeline()
+            ContentFilter.get_pipeline()
+            self.assertEqual(compile_pipeline.call_count, 1)
+            
+            # Another process saved a ModerationRule
+            cache.incr(ContentFilter.PIPELINE_VERSION_KEY)
+            ContentFilter.get_pipeline()
+            self.assertEqual(compile_pipeline.call_count, 2)
+            
+            # The version key was evicted
+            cache.clear()
+            ContentFilter.get_pipeline()
+            self.assertEqual(compile_pipeline.call_count, 3)
+    
+    def test_moderate_content(self):
+        """Without a rules table the built-in checks still run"""
+        from .moderation import ContentFilter
+        
+        cache.clear()
+        self.addCleanup(setattr, ContentFilter, '_pipeline', None)
+        self.assertEqual(
+            ContentFilter.moderate_content('a perfectly normal sentence', self.user),
+            {'action': 'approve', 'issues': []}
+        )
+        self.assertEqual(
+            ContentFilter.moderate_content('well, badword2', self.user),
+            {'action': 'flag', 'issues': [{'type': 'profanity', 'severity': 3, 'details': ['badword2']}]}
+        )
+        self.assertEqual(
+            ContentFilter.moderate_content('THIS IS LOUD TEXT', self.user),
+            {'action': 'warn', 'issues': [{'type': 'spam', 'severity': 2, 'details': ['excessive_caps']}]}
+        )
+
+
+class ContentReportTestCase(TestCase):
+    """Test the cached recent-report count behind auto-escalation"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reported', password='testpass123')
+    
+    def test_recent_report_count_sums_the_last_days(self):
+        """Reports count while their day is one of the last RECENT_DAYS days"""
+        from unittest import mock
+        from .moderation import ContentReport
+        
+        now = timezone.now()
+        today = now.date()
+        # Buckets already seeded, with no earlier reports
+        cache.set_many({
+            ContentReport._report_bucket_key(self.user.id, today + timedelta(days=n)): 0
+            for n in range(-ContentReport.RECENT_DAYS, 2)
+        })
+        for age in (timedelta(days=7), timedelta(days=6), timedelta(0)):
+            ContentReport.count_recent_report(ContentReport(reported_user=self.user, created_at=now - age))
+        
+        # Today and the 6 days before it
+        self.assertEqual(ContentReport.recent_report_count(self.user.id), 2)
+        
+        # A day later the 6-day-old report's day has dropped out
+        with mock.patch('core.moderation.timezone.now', return_value=now + timedelta(days=1)):
+            self.assertEqual(ContentReport.recent_report_count(self.user.id), 1)
+
+
+class SeedDataTestCase(TestCase):
+    """Test that seed_data's bulk inserts keep the denormalized fields consistent"""
+    
+    def setUp(self):
+        call_command('seed_data', stdout=StringIO())
+    
+    def test_post_fields_match_recount(self):
+        for post in Post.objects.select_related('author'):
+            self.assertEqual(post.author_username, post.author.username)
+            self.assertEqual(post.comment_count, Comment.objects.filter(post=post).count())
+            self.assertEqual(post.like_count, Like.objects.filter(content_type='post', object_id=post.id).count())
+    
+    def test_comment_fields_match_recount(self):
+        comments = Comment.objects.select_related('parent')
+        self.assertTrue(comments.exists())
+        for comment in comments:
+            self.assertEqual(comment.depth, comment.parent.depth + 1 if comment.parent else 0)
+            if comment.parent:
+                self.assertEqual(comment.post_id, comment.parent.post_id)
+            self.assertEqual(comment.like_count, Like.objects.filter(content_type='comment', object_id=comment.id).count())
+    
+    def test_likes_point_at_their_target(self):
+        for like in Like.objects.all():
+            if like.content_type == 'post':
+                self.assertEqual((like.post_id, like.comment_id), (like.object_id, None))
+            else:
+                self.assertEqual((like.post_id, like.comment_id), (None, like.object_id))
+    
+    def test_one_karma_event_per_like(self):
+        events = sorted(KarmaEvent.objects.values_list('user_id', 'event_type', 'source_id', 'points'))
+        expected = sorted(
+            [(like.post.author_id, 'POST_LIKE', like.object_id, 5)
+             for like in Like.objects.filter(content_type='post').select_related('post')]
+            + [(like.comment.author_id, 'COMMENT_LIKE', like.object_id, 1)
+               for like in Like.objects.filter(content_type='comment').select_related('comment')]
+        )
+        self.assertEqual(events, expected)
+
+
+class AchievementIdCacheTestCase(TestCase):
+    """Test the per-process achievement id cache"""
+    
+    def test_ids_reloaded_when_another_process_deletes_an_achievement(self):
+        from unittest import mock
+        from . import gamification
+        
+        cache.clear()
+        self.addCleanup(gamification._achievement_ids.clear)
+        rows = iter([mock.Mock(id=1), mock.Mock(id=2)])
+        with mock.patch.object(
+            gamification.Achievement.objects, 'get_or_create', side_effect=lambda **kwargs: (next(rows), True)
+        ) as get_or_create:
+            self.assertEqual(gamification._get_achievement_ids(['first_post']), [1])
+            self.assertEqual(gamification._get_achievement_ids(['first_post']), [1])
+            self.assertEqual(get_or_create.call_count, 1)
+            
+            # Another process deleted (and recreated) the achievement
+            gamification._bump_achievement_ids_version()
+            self.assertEqual(gamification._get_achievement_ids(['first_post']), [2])
+            self.assertEqual(get_or_create.call_count, 2)
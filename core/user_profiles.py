@@ -27,7 +27,19 @@ Advanced User Profile Features to Add:
 
 # Example Profile Model Extension
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+from datetime import timedelta
+
+KARMA_WINDOW = timedelta(hours=24)
+
+# Cache key holding the window start the karma_24h counters were last swept to
+KARMA_SWEEP_KEY = 'profiles:karma_24h:swept_to'
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -37,5 +49,68 @@ class UserProfile(models.Model):
     website = models.URLField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Karma earned in the last 24 hours. Karma events add to it as they are
+    # written and expire_old_karma() takes events back out as they age past
+    # the window, so the leaderboard can read it with ORDER BY ... LIMIT.
+    karma_24h = models.IntegerField(default=0, db_index=True)
+    
     def __str__(self):
-        return f"{self.user.username}'s Profile"
\ No newline at end of file
+        return f"{self.user.username}'s Profile"
+    
+    @classmethod
+    def add_karma(cls, user_id, points):
+        """Atomically adjust a user's 24h karma, never going below zero"""
+        cls.objects.filter(user_id=user_id).update(
+            karma_24h=Greatest(F('karma_24h') + points, Value(0))
+        )
+    
+    @classmethod
+    def recompute_karma_24h(cls):
+        """Full reconciliation of every karma_24h counter from the events"""
+        from .models import KarmaEvent
+        
+        cutoff = timezone.now() - KARMA_WINDOW
+        cls.objects.update(karma_24h=Coalesce(Subquery(
+            KarmaEvent.objects.filter(user_id=OuterRef('user_id'), created_at__gte=cutoff)
+            .values('user_id').annotate(total=Sum('points')).values('total')
+        ), 0))
+        cache.set(KARMA_SWEEP_KEY, cutoff, None)
+    
+    @classmethod
+    def expire_old_karma(cls):
+        """
+        Subtract karma events that have aged out of the 24h window.
+        
+        Run it from cron every few minutes. Only the events between the
+        previous sweep and now are read; with no sweep on record it falls
+        back to recompute_karma_24h().
+        """
+        from .models import KarmaEvent
+        
+        swept_to = cache.get(KARMA_SWEEP_KEY)
+        if swept_to is None:
+            cls.recompute_karma_24h()
+            return
+        
+        cutoff = timezone.now() - KARMA_WINDOW
+        expired = (
+            KarmaEvent.objects.filter(created_at__gte=swept_to, created_at__lt=cutoff)
+            .values('user_id').annotate(total=Sum('points'))
+        )
+        for row in expired:
+            cls.add_karma(row['user_id'], -row['total'])
+        cache.set(KARMA_SWEEP_KEY, cutoff, None)
+
+
+@receiver(post_save, sender='core.KarmaEvent')
+def add_karma_24h(sender, instance, created, **kwargs):
+    if created:
+        UserProfile.add_karma(instance.user_id, instance.points)
+
+
+@receiver(post_delete, sender='core.KarmaEvent')
+def remove_karma_24h(sender, instance, **kwargs):
+    # Events already swept out of the window were subtracted then
+    swept_to = cache.get(KARMA_SWEEP_KEY)
+    if swept_to is None or instance.created_at >= swept_to:
+        UserProfile.add_karma(instance.user_id, -instance.points)
@@ -1,34 +1,66 @@
+import re
+
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db import transaction
-from django.db.models import Prefetch, Sum
+from django.http import Http404
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Prefetch, Q
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Post, Comment, Like, KarmaEvent
+from .models import Post, Comment, Like, KarmaEvent, LeaderboardSnapshot
+from .pagination import PostCursorPagination
 from .serializers import (
     PostSerializer, CommentSerializer, CommentCreateSerializer,
     LikeSerializer, LeaderboardSerializer, UserSerializer
 )
 
 
+# Letters, digits, hyphens and underscores, with at least one letter or
+# digit (Unicode-aware, like the str.isalnum() check it replaces)
+_USERNAME_RE = re.compile(r'(?=[\w-]*[^\W_])[\w-]+')
+
+# The author columns UserSerializer renders, for only() on nested authors
+AUTHOR_FIELDS = [f'author__{name}' for name in UserSerializer.Meta.fields]
+
+# The Post columns PostSerializer renders (media_type and is_liked are annotated)
+POST_FIELDS = [
+    'content', 'created_at', 'updated_at', 'like_count', 'comment_count',
+    'image', 'video', *AUTHOR_FIELDS
+]
+
+
+def flat_representation(obj, serializer_class):
+    """
+    ``serializer_class(obj).data`` for serializers whose fields are all plain
+    attributes, read directly without building DRF's field machinery.
+    """
+    return {name: getattr(obj, name) for name in serializer_class.Meta.fields}
+
+
 class PostListCreateView(generics.ListCreateAPIView):
     """
     List all posts or create a new post.
     
     Optimizations:
     - select_related for author to avoid N+1 queries
-    - Ordering by creation date for consistent pagination
+    - only() limits rows to the columns PostSerializer renders
+    - is_liked is annotated with an EXISTS subquery, not queried per post
+    - Cursor (keyset) pagination on creation date, so deep pages stay cheap
     """
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PostCursorPagination
     
     def get_queryset(self):
-        return Post.objects.select_related('author').order_by('-created_at')
+        return Post.objects.select_related('author').only(*POST_FIELDS).with_media_type().annotate(
+            liked_by_me=Like.liked_by(self.request.user, 'post')
+        ).order_by(*PostCursorPagination.ordering)
 
 
 class PostCommentsView(generics.RetrieveAPIView):
@@ -39,10 +71,9 @@ class PostCommentsView(generics.RetrieveAPIView):
     without N+1 queries.
     
     Strategy:
-    1. Fetch all comments for the post in a single query
-    2. Build the tree structure in Python using a dictionary lookup
-    3. Attach replies to parent comments as 'prefetched_replies' attribute
-    4. Serialize the root comments, which recursively includes replies
+    1. Prefetch all comments for the post in a single query
+    2. Serialize each comment once, in a flat pass
+    3. Link the serialized comments to their parents by parent_id
     
     This approach:
     - Uses only 2 DB queries total (post + all comments)
@@ -52,36 +83,27 @@ class PostCommentsView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, pk):
-        # Get the post
-        post = get_object_or_404(Post.objects.select_related('author'), pk=pk)
+        posts = Post.objects.select_related('author').only(*POST_FIELDS).with_media_type().annotate(
+            liked_by_me=Like.liked_by(request.user, 'post')
+        )
         
-        # Fetch ALL comments for this post in a single query
+        # Get the post, with ALL its comments prefetched in a single query
         # This is key to avoiding N+1 - we get everything at once
-        all_comments = Comment.objects.filter(post=post).select_related('author').order_by('created_at')
-        
-        # Build comment tree in Python to avoid recursive queries
-        comment_dict = {}
-        root_comments = []
-        
-        # First pass: create dictionary of all comments
-        for comment in all_comments:
-            comment.prefetched_replies = []  # Initialize replies list
-            comment_dict[comment.id] = comment
-        
-        # Second pass: build parent-child relationships
-        for comment in all_comments:
-            if comment.parent_id:
-                # This is a reply - add to parent's replies
-                parent = comment_dict.get(comment.parent_id)
-                if parent:
-                    parent.prefetched_replies.append(comment)
-            else:
-                # This is a root comment
-                root_comments.append(comment)
+        # Only the columns CommentSerializer renders (no password hashes etc.),
+        # plus the user's like status as an EXISTS subquery
+        comments = Comment.objects.select_related('author').only(
+            'post', 'parent', 'content', 'created_at', 'updated_at', 'like_count', 'depth',
+            *AUTHOR_FIELDS
+        ).annotate(
+            liked_by_me=Like.liked_by(request.user, 'comment')
+        ).order_by('created_at')
+        post = get_object_or_404(posts.prefetch_related(Prefetch('comments', queryset=comments)), pk=pk)
+        all_comments = post.comments.all()
+        context = {'request': request}
         
         # Serialize post and comments
-        post_data = PostSerializer(post, context={'request': request}).data
-        comments_data = CommentSerializer(root_comments, many=True, context={'request': request}).data
+        post_data = PostSerializer(post, context=context).data
+        comments_data = CommentSerializer.build_tree(all_comments, context)
         
         return Response({
             'post': post_data,
@@ -106,6 +128,32 @@ def create_comment(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def toggle_like(user, content_type, object_id):
+    """
+    Unlike the target if the user already likes it, otherwise like it.
+    
+    The DELETE's row count says which case this is, so there is no
+    separate existence SELECT, and the unique constraint settles any
+    concurrent like that slips in before the INSERT. Returns True if the
+    target is now liked.
+    """
+    deleted, _ = Like.objects.filter(user=user, content_type=content_type, object_id=object_id).delete()
+    if deleted:
+        return False
+    
+    try:
+        # Not just one INSERT: the post_save signal also bumps like_count,
+        # which must commit or fail with the like (the KarmaEvent follows
+        # on commit). Inside an outer transaction this is a savepoint, so a
+        # duplicate's IntegrityError doesn't poison it.
+        with transaction.atomic():
+            Like.objects.create(user=user, content_type=content_type, object_id=object_id)
+    except IntegrityError:
+        # A concurrent request liked it between the DELETE and the INSERT
+        pass
+    return True
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def like_post(request, pk):
@@ -113,47 +161,21 @@ def like_post(request, pk):
     Like or unlike a post (toggle behavior).
     
     Concurrency safety:
-    - Uses database constraints to prevent duplicate likes
-    - Handles IntegrityError gracefully for race conditions
-    - Uses select_for_update for atomic count updates (handled in signals)
+    - DELETE first; its row count decides like vs unlike, and the unique
+      constraint absorbs a concurrent duplicate like
+    - like_count is updated with F() expressions in the Like signals
     """
-    post = get_object_or_404(Post, pk=pk)
-    
-    # Check if user already liked this post
-    existing_like = Like.objects.filter(
-        user=request.user,
-        content_type='post',
-        object_id=post.id
-    ).first()
-    
-    if existing_like:
-        # Unlike - delete the like
-        existing_like.delete()
-        return Response({
-            'liked': False,
-            'like_count': post.like_count  # Will be updated by signal
-        })
-    else:
-        # Like - create new like
-        try:
-            with transaction.atomic():
-                Like.objects.create(
-                    user=request.user,
-                    content_type='post',
-                    object_id=post.id
-                )
-            # Refresh post to get updated count
-            post.refresh_from_db()
-            return Response({
-                'liked': True,
-                'like_count': post.like_count
-            })
-        except Exception as e:
-            # Handle race condition - like might have been created by another request
-            return Response({
-                'liked': True,
-                'like_count': post.like_count
-            })
+    # Existence check only - the full row (and its author join) isn't needed
+    post_id = get_object_or_404(Post.objects.values_list('pk', flat=True), pk=pk)
+    liked = toggle_like(request.user, 'post', post_id)
+    like_count = Post.objects.filter(pk=post_id).values_list('like_count', flat=True).first()
+    if like_count is None:
+        # Deleted since the toggle
+        raise Http404
+    return Response({
+        'liked': liked,
+        'like_count': like_count
+    })
 
 
 @api_view(['POST'])
@@ -164,43 +186,21 @@ def like_comment(request, pk):
     
     Same concurrency safety approach as like_post.
     """
-    comment = get_object_or_404(Comment, pk=pk)
-    
-    # Check if user already liked this comment
-    existing_like = Like.objects.filter(
-        user=request.user,
-        content_type='comment',
-        object_id=comment.id
-    ).first()
-    
-    if existing_like:
-        # Unlike - delete the like
-        existing_like.delete()
-        return Response({
-            'liked': False,
-            'like_count': comment.like_count
-        })
-    else:
-        # Like - create new like
-        try:
-            with transaction.atomic():
-                Like.objects.create(
-                    user=request.user,
-                    content_type='comment',
-                    object_id=comment.id
-                )
-            # Refresh comment to get updated count
-            comment.refresh_from_db()
-            return Response({
-                'liked': True,
-                'like_count': comment.like_count
-            })
-        except Exception as e:
-            # Handle race condition
-            return Response({
-                'liked': True,
-                'like_count': comment.like_count
-            })
+    # Existence check only - the full row (and its author join) isn't needed
+    comment_id = get_object_or_404(Comment.objects.values_list('pk', flat=True), pk=pk)
+    liked = toggle_like(request.user, 'comment', comment_id)
+    like_count = Comment.objects.filter(pk=comment_id).values_list('like_count', flat=True).first()
+    if like_count is None:
+        # Deleted since the toggle
+        raise Http404
+    return Response({
+        'liked': liked,
+        'like_count': like_count
+    })
+
+
+LEADERBOARD_CACHE_KEY = 'leaderboard:24h:top5'
+LEADERBOARD_CACHE_TIMEOUT = 60  # seconds
 
 
 @api_view(['GET'])
@@ -209,25 +209,26 @@ def leaderboard(request):
     """
     Get top 5 users by karma earned in the last 24 hours.
     
-    This is the key performance challenge - must use a single efficient query.
+    This is the key performance challenge. Sources, cheapest first:
+    1. The serialized result, cached for LEADERBOARD_CACHE_TIMEOUT seconds
+    2. LeaderboardSnapshot (one indexed query), while the
+       refresh_leaderboard job keeps it fresh
+    3. KarmaEvent.get_leaderboard_last_24h(): karma summed per user_id over
+       the last 24h of events, then the top 5 users loaded (2 queries)
     
-    Query breakdown:
-    1. Filter karma events from last 24 hours
-    2. Group by user and sum points
-    3. Order by total karma descending
-    4. Limit to top 5
-    
-    The query uses Django ORM aggregation to avoid Python loops and N+1 queries.
-    All computation happens in the database for optimal performance.
+    All aggregation happens in the database - no Python loops or N+1 queries.
     """
-    leaderboard_users = KarmaEvent.get_leaderboard_last_24h(limit=5)
-    
-    # Handle case where no users have karma in last 24h
-    if not leaderboard_users:
-        return Response([])
+    data = cache.get(LEADERBOARD_CACHE_KEY)
+    if data is None:
+        # Precomputed snapshot when the refresh job is keeping it current,
+        # otherwise aggregate the karma events directly
+        leaderboard_users = LeaderboardSnapshot.top(limit=5)
+        if leaderboard_users is None:
+            leaderboard_users = KarmaEvent.get_leaderboard_last_24h(limit=5)
+        data = [flat_representation(user, LeaderboardSerializer) for user in leaderboard_users]
+        cache.set(LEADERBOARD_CACHE_KEY, data, LEADERBOARD_CACHE_TIMEOUT)
     
-    serializer = LeaderboardSerializer(leaderboard_users, many=True)
-    return Response(serializer.data)
+    return Response(data)
 
 
 # Additional utility views for debugging/admin
@@ -241,15 +242,9 @@ def user_karma(request, user_id=None):
     else:
         user = request.user
     
-    karma_24h = KarmaEvent.get_user_karma_last_24h(user)
-    total_karma = KarmaEvent.objects.filter(user=user).aggregate(
-        total=Sum('points')
-    )['total'] or 0
-    
     return Response({
         'user': UserSerializer(user).data,
-        'karma_24h': karma_24h,
-        'total_karma': total_karma
+        **KarmaEvent.get_user_karma_totals(user)
     })
 
 
@@ -275,25 +270,31 @@ def register_user(request):
                 'error': 'Password must be at least 6 characters long'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        if User.objects.filter(username=username).exists():
+        # Validate username format
+        if not _USERNAME_RE.fullmatch(username):
             return Response({
-                'error': 'Username already exists'
+                'error': 'Username can only contain letters, numbers, hyphens, and underscores'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        if User.objects.filter(email=email).exists():
+        if len(username) < 3:
             return Response({
-                'error': 'Email already exists'
+                'error': 'Username must be at least 3 characters long'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Validate username format
-        if not username.replace('_', '').replace('-', '').isalnum():
+        # Username and email collisions in one query
+        taken = User.objects.filter(Q(username=username) | Q(email=email)).aggregate(
+            username=Count('pk', filter=Q(username=username)),
+            email=Count('pk', filter=Q(email=email)),
+        )
+        
+        if taken['username']:
             return Response({
-                'error': 'Username can only contain letters, numbers, hyphens, and underscores'
+                'error': 'Username already exists'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        if len(username) < 3:
+        if taken['email']:
             return Response({
-                'error': 'Username must be at least 3 characters long'
+                'error': 'Email already exists'
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Create user
@@ -328,5 +329,5 @@ def register_user(request):
 def current_user(request):
     """Get current user info"""
     return Response({
-        'user': UserSerializer(request.user).data
+        'user': flat_representation(request.user, UserSerializer)
     })
\ No newline at end of file
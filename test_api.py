@@ -57,13 +57,18 @@ def test_leaderboard_api():
     # Test posts endpoint
     posts_url = 'http://127.0.0.1:8000/api/posts/'
     try:
-        response = requests.get(posts_url, headers=headers)
-        if response.status_code == 200:
+        # The feed is cursor-paginated: follow 'next' until it runs out
+        posts = []
+        while posts_url:
+            response = requests.get(posts_url, headers=headers)
+            if response.status_code != 200:
+                print(f"❌ Posts failed: {response.status_code}")
+                break
             data = response.json()
-            posts = data.get('results', data)
-            print(f"✅ Posts API working - {len(posts)} posts found")
+            posts.extend(data['results'])
+            posts_url = data['next']
         else:
-            print(f"❌ Posts failed: {response.status_code}")
+            print(f"✅ Posts API working - {len(posts)} posts found")
     except Exception as e:
         print(f"❌ Posts error: {e}")
 